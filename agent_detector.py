@@ -1,12 +1,42 @@
 import cv2
 import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
 from utils import setup_logger
+from team_numba import (
+    NUMBA_AVAILABLE,
+    TEAM_ATTACK,
+    TEAM_DEFEND,
+    TEAM_NAMES,
+    TEAM_UNKNOWN,
+    classify_team_rings,
+)
 
 logger = setup_logger("AgentDetector")
 
+# Columns of the detection buffer (one row per raw template match)
+DET_X, DET_Y, DET_W, DET_H, DET_CONF, DET_AGENT, DET_TEAM = range(7)
+MAX_DETS = 1024
+
+# Byte alignment of the detection buffer columns (one cache line)
+BUFFER_ALIGNMENT = 64
+
+
+def _aligned_columns(rows: int, cols: int) -> np.ndarray:
+    """
+    float32 (rows, cols) array in column-major order whose columns each
+    start on a BUFFER_ALIGNMENT boundary (rows is rounded up to keep them so)
+    """
+    per_line = BUFFER_ALIGNMENT // np.dtype(np.float32).itemsize
+    rows = -(-rows // per_line) * per_line
+    nbytes = rows * cols * np.dtype(np.float32).itemsize
+    raw = np.empty(nbytes + BUFFER_ALIGNMENT, dtype=np.uint8)
+    offset = -raw.ctypes.data % BUFFER_ALIGNMENT
+    flat = raw[offset : offset + nbytes].view(np.float32)
+    return flat.reshape((rows, cols), order="F")
+
 
 @dataclass
 class AgentDetection:
@@ -35,14 +65,57 @@ class AgentDetector:
         # Scale variations for template matching
         self.scales = [64, 48, 32]
 
+        # Coarse-to-fine search: candidates are found on a half-resolution
+        # pyramid level with a looser threshold, then re-scored at full
+        # resolution only inside the candidate regions
+        self.coarse_threshold_margin = 0.15
+        self.coarse_close_kernel = np.ones((3, 3), dtype=np.uint8)
+
+        # Full-frame matches of templates at least this large (the 32px scale
+        # on the half-resolution level) use the DFT path with cached spectra
+        self.dft_min_template_size = 16
+        self._template_spectra: Dict[Tuple, Tuple[List[np.ndarray], np.ndarray]] = {}
+
         self.agent_templates = self._load_agent_templates()
+        self.coarse_templates = {
+            name: [cv2.pyrDown(t) for t in templates]
+            for name, templates in self.agent_templates.items()
+        }
         self.agent_names = list(self.agent_templates.keys())
+
+        # Full-resolution matching runs on uint8 frames and templates, which
+        # OpenCV reads with a quarter of the memory traffic of float32
+        self.agent_templates_u8 = {
+            name: [self._to_uint8(t) for t in templates]
+            for name, templates in self.agent_templates.items()
+        }
+
+        # Optional CUDA template matching, used when OpenCV was built with it
+        self.use_gpu = self._cuda_available()
+        if self.use_gpu:
+            self._init_gpu_matching()
+
+        # Template matches are independent and OpenCV releases the GIL,
+        # so the CPU path spreads them over a small thread pool
+        self.match_pool = ThreadPoolExecutor(
+            max_workers=max(1, (os.cpu_count() or 2) // 2),
+            thread_name_prefix="AgentMatch",
+        )
+
+        # Detection buffer reused across frames: one aligned, contiguous
+        # column per field; grows (and stays grown) if a frame overflows it
+        self._det_buffer = _aligned_columns(MAX_DETS, DET_TEAM + 1)
+
+        # Team ring masks only depend on the template size, so build them once
+        self.ring_width = 5
+        self.ring_masks = {scale: self._build_ring_mask(scale) for scale in self.scales}
         logger.info(f"Loaded {len(self.agent_names)} agent templates")
 
     def _load_agent_templates(self) -> Dict[str, List[np.ndarray]]:
         """
         Load all agent icon templates with alpha channel
         Returns: {agent_name: [template_64, template_48, template_32]}
+        Each template is BGR float32, premultiplied by its alpha channel.
         """
         templates = {}
 
@@ -79,167 +152,477 @@ class AgentDetector:
                 scaled = cv2.resize(
                     template, (new_w, new_h), interpolation=cv2.INTER_AREA
                 )
-                scaled_templates.append(scaled)
+                scaled_templates.append(self._premultiply_alpha(scaled))
 
             templates[agent_name] = scaled_templates
             logger.debug(f"Loaded {agent_name}: {[t.shape for t in scaled_templates]}")
 
         return templates
 
-    def _classify_team(
-        self, image: np.ndarray, x: int, y: int, template_size: Tuple[int, int]
-    ) -> str:
+    def _premultiply_alpha(self, template: np.ndarray) -> np.ndarray:
         """
-        Classify team based on color around the detection
-        Red circle = attack, Blue/Green circle = defend
+        Weight the BGR channels by the alpha channel (if any) so matching
+        only has to see a plain 3-channel float32 template
         """
-        h, w = image.shape[:2]
-        tw, th = template_size
+        if template.shape[2] == 4:
+            alpha = template[:, :, 3:4] / 255.0
+            return (template[:, :, :3] * alpha).astype(np.float32)
+        return template.astype(np.float32)
 
-        # Sample colors in a ring around the detection (outside the template)
-        ring_width = 5
-        radius = max(tw, th) // 2 + ring_width
+    def _to_uint8(self, template: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(template), 0, 255).astype(np.uint8)
 
-        # Define sampling region (clamped to image bounds)
-        y_min = max(0, y - radius)
-        y_max = min(h, y + radius)
-        x_min = max(0, x - radius)
-        x_max = min(w, x + radius)
+    def _cuda_available(self) -> bool:
+        try:
+            return cv2.cuda.getCudaEnabledDeviceCount() > 0
+        except (AttributeError, cv2.error):
+            return False
 
-        region = image[y_min:y_max, x_min:x_max]
+    def _init_gpu_matching(self):
+        """
+        Create one matcher per template scale and keep every template
+        channel resident on the GPU. CUDA TM_CCOEFF_NORMED needs 8-bit input,
+        and channels are matched separately to score like the CPU path.
+        """
+        self.gpu_stream = cv2.cuda_Stream()
+        self.gpu_matchers = {
+            scale: cv2.cuda.createTemplateMatching(cv2.CV_8UC1, cv2.TM_CCOEFF_NORMED)
+            for scale in self.scales
+        }
+        self.gpu_templates = {}
+        for agent_name, templates in self.agent_templates_u8.items():
+            gpu_templates = []
+            for template in templates:
+                gpu_channels = []
+                for channel in cv2.split(template):
+                    gpu_channel = cv2.cuda_GpuMat()
+                    gpu_channel.upload(np.ascontiguousarray(channel))
+                    gpu_channels.append(gpu_channel)
+                gpu_templates.append(gpu_channels)
+            self.gpu_templates[agent_name] = gpu_templates
+        logger.info("Using CUDA template matching")
+
+    def _prepare_frame(self, image: np.ndarray) -> Dict:
+        """
+        Per-frame state shared by every full-frame template match:
+        the channel planes, the DFT of each channel and the integral images
+        used for normalization
+        """
+        h, w = image.shape[:2]
+        dft_size = (cv2.getOptimalDFTSize(h), cv2.getOptimalDFTSize(w))
 
-        if region.size == 0:
-            return "unknown"
+        channels = cv2.split(image)
+        spectra = []
+        for channel in channels:
+            padded = cv2.copyMakeBorder(
+                channel, 0, dft_size[0] - h, 0, dft_size[1] - w, cv2.BORDER_CONSTANT
+            )
+            spectra.append(cv2.dft(padded))
+
+        sums, sqsums = cv2.integral2(image, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+
+        return {
+            "image": image,
+            "channels": channels,
+            "dft_size": dft_size,
+            "spectra": spectra,
+            "sums": sums,
+            "sqsums": sqsums,
+            # (th, tw) -> (window norm, flat mask), shared by every template
+            # of that size
+            "window_norms": {},
+        }
+
+    def _get_template_spectra(
+        self, template_key: Tuple, template: np.ndarray, dft_size: Tuple[int, int]
+    ) -> Tuple[List[np.ndarray], np.ndarray]:
+        """
+        DFT of each zero-mean template channel padded to dft_size, and the
+        energy of each channel. Cached, since templates never change after load.
+        """
+        cache_key = (template_key, dft_size)
+        cached = self._template_spectra.get(cache_key)
+        if cached is not None:
+            return cached
+
+        th, tw = template.shape[:2]
+        zero_mean = template - template.mean(axis=(0, 1))
+        energy = np.sum(zero_mean.astype(np.float64) ** 2, axis=(0, 1))
+
+        spectra = []
+        for channel in cv2.split(zero_mean):
+            padded = cv2.copyMakeBorder(
+                channel, 0, dft_size[0] - th, 0, dft_size[1] - tw, cv2.BORDER_CONSTANT
+            )
+            spectra.append(cv2.dft(padded))
 
-        # Convert to RGB
-        region_rgb = cv2.cvtColor(region, cv2.COLOR_BGR2RGB)
+        self._template_spectra[cache_key] = (spectra, energy)
+        return spectra, energy
 
-        # Sample pixels in the ring
-        mask_radius = max(tw, th) // 2
-        center_y, center_x = y - y_min, x - x_min
-        yy, xx = np.ogrid[: region.shape[0], : region.shape[1]]
-        distance = np.sqrt((xx - center_x) ** 2 + (yy - center_y) ** 2)
-        ring_mask = (distance >= mask_radius) & (distance <= radius)
+    def _get_window_norm(
+        self, frame: Dict, th: int, tw: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Root of the per-window variance of each channel for a (th, tw)
+        template, and the per-channel mask of flat windows. Cached on the
+        frame, since it only depends on the template size and not on the
+        template itself.
+        """
+        cached = frame["window_norms"].get((th, tw))
+        if cached is not None:
+            return cached
+
+        # Window sums of I and I^2 with four lookups into the integral images
+        def window_sum(integral: np.ndarray) -> np.ndarray:
+            return (
+                integral[th:, tw:]
+                - integral[:-th, tw:]
+                - integral[th:, :-tw]
+                + integral[:-th, :-tw]
+            )
 
-        ring_pixels = region_rgb[ring_mask]
+        sums = window_sum(frame["sums"])
+        sqsums = window_sum(frame["sqsums"])
+        variance = sqsums - sums * sums / (th * tw)
 
-        if len(ring_pixels) < 10:
-            return "unknown"
+        # Same flat-window cutoff as OpenCV, which scores those windows as 0
+        flat = variance <= np.minimum(0.5, 10 * np.finfo(np.float32).eps * sqsums)
+        window_norm = np.sqrt(np.maximum(variance, 0.0))
 
-        # Calculate average color
-        avg_color = np.mean(ring_pixels, axis=0)
-        r, g, b = avg_color
+        frame["window_norms"][(th, tw)] = (window_norm, flat)
+        return window_norm, flat
 
-        offset = self.team_color_offset
+    def _match_template_dft(
+        self, frame: Dict, template: np.ndarray, template_key: Tuple
+    ) -> np.ndarray:
+        """
+        Per-channel TM_CCOEFF_NORMED over the whole frame via the DFT,
+        averaged over the channels like _match_template_channels: each
+        numerator is an inverse DFT of that channel's cross-spectrum, the
+        denominators come from the frame's integral images
+        """
+        h, w = frame["image"].shape[:2]
+        th, tw = template.shape[:2]
+        spectra, energies = self._get_template_spectra(
+            template_key, template, frame["dft_size"]
+        )
+        window_norm, flat = self._get_window_norm(frame, th, tw)
+
+        result = np.zeros((h - th + 1, w - tw + 1), dtype=np.float32)
+        channel_result = np.empty_like(result)
+        for c, (frame_spectrum, template_spectrum) in enumerate(
+            zip(frame["spectra"], spectra)
+        ):
+            # A flat template channel has no correlation to normalize: scores 0
+            if energies[c] <= 0:
+                continue
+            cross = cv2.mulSpectrums(frame_spectrum, template_spectrum, 0, conjB=True)
+            numerator = cv2.idft(cross, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)
+            numerator = numerator[: h - th + 1, : w - tw + 1]
+            denominator = window_norm[:, :, c] * np.sqrt(energies[c])
+
+            channel_result.fill(0)
+            np.divide(
+                numerator,
+                denominator,
+                out=channel_result,
+                where=~flat[:, :, c],
+                casting="unsafe",
+            )
+            result += channel_result
 
-        # Red = attack
-        if r > g + offset and r > b + offset:
-            return "attack"
-        # Blue or Green = defend
-        elif b > r + offset or g > r + offset:
-            return "defend"
-        else:
-            # Check which color is dominant
-            if r >= g and r >= b:
-                return "attack"
-            else:
-                return "defend"
-
-    def _non_max_suppression(
-        self, detections: List[Dict], iou_threshold: float
-    ) -> List[Dict]:
+        result /= len(spectra)
+        return result
+
+    @staticmethod
+    def _match_template_channels(
+        channels: List[np.ndarray], template: np.ndarray
+    ) -> np.ndarray:
+        """
+        Detection score: TM_CCOEFF_NORMED of each BGR channel, averaged.
+        A single 3-channel call would normalize over all channels jointly,
+        which scores differently and shifts what detection_threshold means.
+        """
+        template_channels = cv2.split(template)
+        result = cv2.matchTemplate(
+            channels[0], template_channels[0], cv2.TM_CCOEFF_NORMED
+        )
+        for channel, template_channel in zip(channels[1:], template_channels[1:]):
+            result += cv2.matchTemplate(channel, template_channel, cv2.TM_CCOEFF_NORMED)
+        result /= len(channels)
+        return result
+
+    def _match_full_frame(
+        self, frame: Dict, template: np.ndarray, template_key: Tuple
+    ) -> np.ndarray:
+        if min(template.shape[:2]) >= self.dft_min_template_size:
+            return self._match_template_dft(frame, template, template_key)
+        return self._match_template_channels(frame["channels"], template)
+
+    def _match_coarse_to_fine(
+        self,
+        minimap_channels: List[np.ndarray],
+        coarse_frame: Dict,
+        template: np.ndarray,
+        coarse_template: np.ndarray,
+        template_key: Tuple,
+    ) -> List[Tuple[int, int, float]]:
         """
-        NMS to remove duplicate detections
+        Match a template using the half-resolution pyramid level to find
+        candidate regions, then re-score those regions at full resolution.
+        Returns: [(x, y, score)] of top-left corners above the threshold
         """
-        if not detections:
+        h, w = minimap_channels[0].shape[:2]
+        th, tw = template.shape[:2]
+        if th > h or tw > w:
             return []
 
-        # Sort by confidence
-        detections.sort(key=lambda x: x["confidence"], reverse=True)
+        coarse_result = self._match_full_frame(
+            coarse_frame, coarse_template, template_key
+        )
+        coarse_threshold = self.detection_threshold - self.coarse_threshold_margin
+        candidates = (coarse_result >= coarse_threshold).astype(np.uint8)
+        if not candidates.any():
+            return []
+
+        # Merge nearby candidates so each cluster is refined with one call
+        candidates = cv2.morphologyEx(
+            candidates, cv2.MORPH_CLOSE, self.coarse_close_kernel
+        )
+        num_labels, _, stats, _ = cv2.connectedComponentsWithStats(candidates)
+
+        max_x, max_y = w - tw, h - th
+        matches = []
+        for cx, cy, cw, ch, _ in stats[1:num_labels]:
+            # Map the candidate box back to full resolution, padding by the
+            # pyramid's quantization error
+            x0 = max(0, 2 * cx - 2)
+            y0 = max(0, 2 * cy - 2)
+            x1 = min(max_x, 2 * (cx + cw - 1) + 2)
+            y1 = min(max_y, 2 * (cy + ch - 1) + 2)
+            if x0 > x1 or y0 > y1:
+                continue
 
-        keep = []
-        while detections:
-            best = detections.pop(0)
-            keep.append(best)
+            roi = [channel[y0 : y1 + th, x0 : x1 + tw] for channel in minimap_channels]
+            result = self._match_template_channels(roi, template)
 
-            # Remove detections with high IoU
-            remaining = []
-            for det in detections:
-                iou = self._calculate_iou(best, det)
-                if iou < iou_threshold:
-                    remaining.append(det)
-            detections = remaining
+            locs = np.where(result >= self.detection_threshold)
+            for py, px in zip(*locs):
+                matches.append((x0 + px, y0 + py, float(result[py, px])))
 
-        return keep
+        return matches
 
-    def _calculate_iou(self, det1: Dict, det2: Dict) -> float:
+    def _match_templates_cpu(
+        self, minimap: np.ndarray
+    ) -> List[Tuple[int, int, int, List[Tuple[int, int, float]]]]:
         """
-        Calculate IoU between two detections
+        Match each agent template at different scales on the CPU
+        Returns: [(agent_idx, template_h, template_w, matches)]
         """
-        x1, y1, w1, h1 = (
-            det1["x"] - det1["w"] // 2,
-            det1["y"] - det1["h"] // 2,
-            det1["w"],
-            det1["h"],
-        )
-        x2, y2, w2, h2 = (
-            det2["x"] - det2["w"] // 2,
-            det2["y"] - det2["h"] // 2,
-            det2["w"],
-            det2["h"],
-        )
+        # The DFT path needs float32; convert only the half-resolution level
+        coarse_frame = self._prepare_frame(cv2.pyrDown(minimap.astype(np.float32)))
+        minimap_channels = cv2.split(minimap)
+
+        def match(agent_idx: int, scale_idx: int):
+            agent_name = self.agent_names[agent_idx]
+            template = self.agent_templates_u8[agent_name][scale_idx]
+            th, tw = template.shape[:2]
+            matches = self._match_coarse_to_fine(
+                minimap_channels,
+                coarse_frame,
+                template,
+                self.coarse_templates[agent_name][scale_idx],
+                (agent_name, scale_idx),
+            )
+            return agent_idx, th, tw, matches
+
+        futures = [
+            self.match_pool.submit(match, agent_idx, scale_idx)
+            for agent_idx, agent_name in enumerate(self.agent_names)
+            for scale_idx in range(len(self.agent_templates[agent_name]))
+        ]
+        all_matches = [future.result() for future in futures]
+
+        return all_matches
+
+    def _match_templates_gpu(
+        self, minimap: np.ndarray
+    ) -> List[Tuple[int, int, int, List[Tuple[int, int, float]]]]:
+        """
+        Match each agent template at different scales on the GPU.
+        The minimap is uploaded once; every match and threshold is queued on
+        one stream and the stream is synchronized once before reading results.
+        Returns: [(agent_idx, template_h, template_w, matches)]
+        """
+        h, w = minimap.shape[:2]
+        stream = self.gpu_stream
+
+        gpu_minimap = cv2.cuda_GpuMat()
+        gpu_minimap.upload(np.ascontiguousarray(minimap), stream=stream)
+        gpu_channels = cv2.cuda.split(gpu_minimap, stream=stream)
+        n_channels = len(gpu_channels)
+
+        pending = []
+        for agent_idx, agent_name in enumerate(self.agent_names):
+            for scale, template, gpu_template_channels in zip(
+                self.scales,
+                self.agent_templates[agent_name],
+                self.gpu_templates[agent_name],
+            ):
+                th, tw = template.shape[:2]
+                if th > h or tw > w:
+                    continue
+
+                # Sum of the per-channel scores; divided back to a mean on
+                # the host once the stream has finished
+                matcher = self.gpu_matchers[scale]
+                result = matcher.match(
+                    gpu_channels[0], gpu_template_channels[0], stream=stream
+                )
+                for gpu_channel, gpu_template in zip(
+                    gpu_channels[1:], gpu_template_channels[1:]
+                ):
+                    channel_result = matcher.match(
+                        gpu_channel, gpu_template, stream=stream
+                    )
+                    result = cv2.cuda.add(result, channel_result, stream=stream)
+
+                # Zero everything below the threshold so only hits survive
+                _, scores = cv2.cuda.threshold(
+                    result,
+                    self.detection_threshold * n_channels,
+                    1.0,
+                    cv2.THRESH_TOZERO,
+                    stream=stream,
+                )
+                pending.append((agent_idx, th, tw, scores.download(stream=stream)))
 
-        # Intersection
-        xi1 = max(x1, x2)
-        yi1 = max(y1, y2)
-        xi2 = min(x1 + w1, x2 + w2)
-        yi2 = min(y1 + h1, y2 + h2)
+        stream.waitForCompletion()
 
-        inter_w = max(0, xi2 - xi1)
-        inter_h = max(0, yi2 - yi1)
-        inter_area = inter_w * inter_h
+        all_matches = []
+        for agent_idx, th, tw, scores in pending:
+            scores /= n_channels
+            locs = np.nonzero(scores)
+            matches = [
+                (int(px), int(py), float(scores[py, px])) for py, px in zip(*locs)
+            ]
+            all_matches.append((agent_idx, th, tw, matches))
 
-        # Union
-        area1 = w1 * h1
-        area2 = w2 * h2
-        union_area = area1 + area2 - inter_area
+        return all_matches
 
-        if union_area == 0:
-            return 0
+    def _build_ring_mask(self, template_size: int) -> np.ndarray:
+        """
+        Boolean (2r, 2r) mask of the ring sampled around a detection of the
+        given template size, centered at (r, r)
+        """
+        mask_radius = template_size // 2
+        radius = mask_radius + self.ring_width
+
+        yy, xx = np.ogrid[: 2 * radius, : 2 * radius]
+        d2 = (xx - radius) ** 2 + (yy - radius) ** 2
+        return (d2 >= mask_radius**2) & (d2 <= radius**2)
 
-        return inter_area / union_area
+    def _get_ring_mask(self, template_size: int) -> np.ndarray:
+        ring_mask = self.ring_masks.get(template_size)
+        if ring_mask is None:
+            ring_mask = self._build_ring_mask(template_size)
+            self.ring_masks[template_size] = ring_mask
+        return ring_mask
 
-    def _remove_duplicate_agents_by_team(
-        self, detections: List[AgentDetection]
-    ) -> List[AgentDetection]:
+    def _classify_teams(self, image: np.ndarray, dets: np.ndarray) -> np.ndarray:
         """
-        Remove duplicate agents within each team.
-        In Valorant, the same agent cannot appear twice on the same team.
-        Keep only the detection with highest confidence for each (team, agent) pair.
+        Classify team for all detection rows at once based on the color around them
+        Red circle = attack, Blue/Green circle = defend
+        Returns: int8 team codes (TEAM_ATTACK, TEAM_DEFEND, TEAM_UNKNOWN)
         """
-        # Group by (team, agent_name)
-        team_agent_groups: Dict[Tuple[str, str], List[AgentDetection]] = {}
+        if len(dets) == 0:
+            return np.empty(0, dtype=np.int8)
 
-        for det in detections:
-            key = (det.team, det.agent_name)
-            if key not in team_agent_groups:
-                team_agent_groups[key] = []
-            team_agent_groups[key].append(det)
-
-        # Keep only the highest confidence detection for each group
-        filtered_detections = []
-        for key, group in team_agent_groups.items():
-            if len(group) > 1:
-                # Sort by confidence descending and keep the best
-                group.sort(key=lambda x: x.confidence, reverse=True)
-                filtered_detections.append(group[0])
+        h, w = image.shape[:2]
+        centers = dets[:, [DET_X, DET_Y]].astype(np.int64)
+        sizes = dets[:, [DET_W, DET_H]].max(axis=1).astype(np.int64)
+
+        # Compiled single-pass ring kernel when numba is installed
+        if NUMBA_AVAILABLE:
+            return classify_team_rings(
+                image, centers, sizes, self.ring_width, self.team_color_offset
+            )
+
+        # Pad once so every ring window lies inside the image; the padded
+        # "valid" plane keeps out-of-bounds pixels out of the averages
+        pad = int(sizes.max()) // 2 + self.ring_width
+        padded = cv2.copyMakeBorder(image, pad, pad, pad, pad, cv2.BORDER_CONSTANT)
+        valid = np.zeros((h + 2 * pad, w + 2 * pad), dtype=bool)
+        valid[pad : pad + h, pad : pad + w] = True
+
+        avg_colors = np.zeros((len(dets), 3), dtype=np.float64)
+        counts = np.zeros(len(dets), dtype=np.int64)
+
+        for size in np.unique(sizes):
+            idx = np.flatnonzero(sizes == size)
+            ring_mask = self._get_ring_mask(int(size))
+            radius = ring_mask.shape[0] // 2
+
+            # Top-left corner of each (2r, 2r) ring window in padded coordinates
+            ys = centers[idx, 1] - radius + pad
+            xs = centers[idx, 0] - radius + pad
+            window = ring_mask.shape
+
+            # (n, 3, 2r, 2r) and (n, 2r, 2r) gathers, one fancy index each
+            patches = np.lib.stride_tricks.sliding_window_view(
+                padded, window, axis=(0, 1)
+            )[ys, xs]
+            masks = (
+                np.lib.stride_tricks.sliding_window_view(valid, window)[ys, xs]
+                & ring_mask
+            )
+
+            counts[idx] = masks.sum(axis=(1, 2))
+            sums = np.einsum("nchw,nhw->nc", patches, masks, dtype=np.float64)
+            avg_colors[idx] = sums / np.maximum(counts[idx], 1)[:, None]
+
+        b, g, r = avg_colors.T
+        offset = self.team_color_offset
+
+        # Red = attack, Blue or Green = defend, otherwise dominant color
+        attack = (r > g + offset) & (r > b + offset)
+        defend = ~attack & ((b > r + offset) | (g > r + offset))
+        dominant_red = (r >= g) & (r >= b)
+        is_attack = attack | (~defend & dominant_red)
+
+        teams = np.where(is_attack, TEAM_ATTACK, TEAM_DEFEND).astype(np.int8)
+        teams[counts < 10] = TEAM_UNKNOWN
+        return teams
+
+    def _select_detections(self, dets: np.ndarray, max_per_team: int = 5) -> np.ndarray:
+        """
+        Enforce the team constraints in one pass over NMS survivors,
+        which arrive sorted by confidence descending:
+        - the same agent cannot appear twice on the same team
+        - a team has at most max_per_team (5) agents
+        Returns row indices into dets, attack first, then defend.
+        """
+        selected = {TEAM_ATTACK: [], TEAM_DEFEND: []}
+        taken = np.zeros((2, len(self.agent_names)), dtype=bool)
+
+        teams = dets[:, DET_TEAM].astype(np.intp).tolist()
+        agents = dets[:, DET_AGENT].astype(np.intp).tolist()
+        for i, (team, agent_idx) in enumerate(zip(teams, agents)):
+            if team == TEAM_UNKNOWN or len(selected[team]) >= max_per_team:
+                continue
+
+            if taken[team, agent_idx]:
                 logger.debug(
-                    f"Removed duplicate {key[0]} agent {key[1]} (kept confidence: {group[0].confidence:.3f})"
+                    f"Removed duplicate {TEAM_NAMES[team]} agent {self.agent_names[agent_idx]}"
                 )
-            else:
-                filtered_detections.append(group[0])
+                continue
 
-        return filtered_detections
+            taken[team, agent_idx] = True
+            selected[team].append(i)
+            if all(len(rows) >= max_per_team for rows in selected.values()):
+                break
+
+        return np.array(selected[TEAM_ATTACK] + selected[TEAM_DEFEND], dtype=np.intp)
 
     def detect(self, minimap: np.ndarray) -> List[AgentDetection]:
         """
@@ -251,91 +634,66 @@ class AgentDetector:
             return []
 
         h, w = minimap.shape[:2]
-        all_detections = []
+        dets = self._det_buffer
+        n_dets = 0
 
-        # Match each agent template at different scales
-        for agent_name, templates in self.agent_templates.items():
-            for template in templates:
-                th, tw = template.shape[:2]
+        if self.use_gpu:
+            all_matches = self._match_templates_gpu(minimap)
+        else:
+            all_matches = self._match_templates_cpu(minimap)
+
+        for agent_idx, th, tw, matches in all_matches:
+            for px, py, score in matches:
+                if n_dets == len(dets):
+                    grown = _aligned_columns(2 * len(dets), dets.shape[1])
+                    grown[:n_dets] = dets
+                    dets = self._det_buffer = grown
+                dets[n_dets, :DET_TEAM] = (
+                    px + tw // 2,
+                    py + th // 2,
+                    tw,
+                    th,
+                    score,
+                    agent_idx,
+                )
+                n_dets += 1
+
+        dets = dets[:n_dets]
+
+        # NMS to remove duplicates (same agent at nearby positions);
+        # survivors come back sorted by confidence descending
+        if n_dets:
+            boxes = dets[:, [DET_X, DET_Y, DET_W, DET_H]].astype(np.int32)
+            boxes[:, :2] -= boxes[:, 2:] // 2
+            keep = cv2.dnn.NMSBoxes(
+                boxes.tolist(),
+                dets[:, DET_CONF].tolist(),
+                self.detection_threshold,
+                self.nms_iou_threshold,
+            )
+            dets = dets[np.ravel(keep).astype(np.intp)]
 
-                # Handle alpha channel - use it as mask
-                if template.shape[2] == 4:
-                    alpha = template[:, :, 3] / 255.0
-                    template_rgb = template[:, :, :3]
-                else:
-                    alpha = None
-                    template_rgb = template
-
-                # Template matching
-                if alpha is not None:
-                    # Weighted template matching with alpha mask
-                    result = np.zeros((h - th + 1, w - tw + 1), dtype=np.float32)
-                    for c in range(3):
-                        channel_result = cv2.matchTemplate(
-                            minimap[:, :, c].astype(np.float32),
-                            (template_rgb[:, :, c] * alpha).astype(np.float32),
-                            cv2.TM_CCOEFF_NORMED,
-                        )
-                        result += channel_result
-                    result /= 3
-                else:
-                    results = []
-                    for c in range(3):
-                        channel_result = cv2.matchTemplate(
-                            minimap[:, :, c].astype(np.float32),
-                            template_rgb[:, :, c].astype(np.float32),
-                            cv2.TM_CCOEFF_NORMED,
-                        )
-                        results.append(channel_result)
-                    result = sum(results) / len(results)
-
-                # Get all locations above threshold
-                locs = np.where(result >= self.detection_threshold)
-
-                for pt in zip(*locs[::-1]):
-                    all_detections.append(
-                        {
-                            "agent_name": agent_name,
-                            "x": pt[0] + tw // 2,
-                            "y": pt[1] + th // 2,
-                            "w": tw,
-                            "h": th,
-                            "confidence": float(result[pt[1], pt[0]]),
-                        }
-                    )
+        # Classify team for every surviving row
+        dets[:, DET_TEAM] = self._classify_teams(minimap, dets)
 
-        # NMS to remove duplicates (same agent at nearby positions)
-        filtered_detections = self._non_max_suppression(
-            all_detections, self.nms_iou_threshold
-        )
+        # One pass for per-team agent dedup and the 5-per-team limit
+        keep = self._select_detections(dets)
 
-        # Classify team and create AgentDetection objects
+        # Only the final rows are turned into AgentDetection objects
         agent_detections = []
-        for det in filtered_detections:
-            team = self._classify_team(
-                minimap, det["x"], det["y"], (det["w"], det["h"])
-            )
-
-            # Normalize coordinates
-            norm_x = det["x"] / w
-            norm_y = det["y"] / h
-
-            detection = AgentDetection(
-                agent_name=det["agent_name"],
-                x=norm_x,
-                y=norm_y,
-                team=team,
-                confidence=det["confidence"],
-                pixel_x=det["x"],
-                pixel_y=det["y"],
+        for i in keep:
+            px, py = int(dets[i, DET_X]), int(dets[i, DET_Y])
+            agent_detections.append(
+                AgentDetection(
+                    agent_name=self.agent_names[int(dets[i, DET_AGENT])],
+                    x=px / w,
+                    y=py / h,
+                    team=TEAM_NAMES[int(dets[i, DET_TEAM])],
+                    confidence=float(dets[i, DET_CONF]),
+                    pixel_x=px,
+                    pixel_y=py,
+                )
             )
-            agent_detections.append(detection)
-
-        # Remove duplicate agents within each team (same agent cannot be used twice)
-        agent_detections = self._remove_duplicate_agents_by_team(agent_detections)
-
-        # Limit to top 5 agents per team (max team size in Valorant)
-        agent_detections = self._limit_team_size(agent_detections)
 
         logger.info(
             f"Detected {len(agent_detections)} agents: {self._count_by_team(agent_detections)}"
@@ -343,24 +701,6 @@ class AgentDetector:
 
         return agent_detections
 
-    def _limit_team_size(
-        self, detections: List[AgentDetection], max_per_team: int = 5
-    ) -> List[AgentDetection]:
-        """
-        Limit detections to top N agents per team based on confidence.
-        """
-        # Separate by team
-        attack = [d for d in detections if d.team == "attack"]
-        defend = [d for d in detections if d.team == "defend"]
-
-        # Sort by confidence and keep top N
-        attack.sort(key=lambda x: x.confidence, reverse=True)
-        defend.sort(key=lambda x: x.confidence, reverse=True)
-
-        final_detections = attack[:max_per_team] + defend[:max_per_team]
-
-        return final_detections
-
     def _count_by_team(self, detections: List[AgentDetection]) -> Dict[str, int]:
         count = {}
         for det in detections:
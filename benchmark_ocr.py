@@ -16,11 +16,14 @@ def benchmark():
     roi = cfg.timer_coords
     
     print("Starting benchmark (Single frame, det=True)...")
-    start = time.time()
+    elapsed = 0.0
     for _ in range(20):
+        # Same image every time: drop the ROI cache so each call runs inference
+        ocr._ocr_cache.clear()
+        start = time.time()
         ocr.detect_timer(img, roi)
-    end = time.time()
-    print(f"Average time per frame: {(end - start) / 20:.4f}s")
+        elapsed += time.time() - start
+    print(f"Average time per frame: {elapsed / 20:.4f}s")
 
     # Mocking a recognition-only call if we were to modify it
     print("\nSimulating Recognition-only (det=False)...")
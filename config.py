@@ -27,6 +27,8 @@ class Config:
 
     # Processing settings
     frame_sample_rate: float = 0.2  # frames per second
+    hw_decode: bool = True  # GPU/hardware video decoding when OpenCV supports it
+    coarse_batch_size: int = 16  # coarse-search sample frames per OCR call
     confidence_threshold: float = 0.5
     full_screenshot: bool = True
 
@@ -91,6 +93,10 @@ class Config:
             config.timer_coords = tuple(data["timer_coords"])
         if "frame_sample_rate" in data:
             config.frame_sample_rate = data["frame_sample_rate"]
+        if "coarse_batch_size" in data:
+            config.coarse_batch_size = data["coarse_batch_size"]
+        if "hw_decode" in data:
+            config.hw_decode = data["hw_decode"]
         if "confidence_threshold" in data:
             config.confidence_threshold = data["confidence_threshold"]
         if "full_screenshot" in data:
@@ -5,13 +5,35 @@ import inspect
 
 model_path = "PaddlePaddle/PaddleOCR-VL"
 
-print("Loading model...")
-model = AutoModelForCausalLM.from_pretrained(
-    model_path, 
+def flash_attention_supported():
+    # FlashAttention 2 needs the flash_attn package and an Ampere or newer GPU
+    if not torch.cuda.is_available():
+        return False
+    try:
+        import flash_attn  # noqa: F401
+    except ImportError:
+        return False
+    major, _ = torch.cuda.get_device_capability()
+    return major >= 8
+
+load_kwargs = dict(
     trust_remote_code=True, 
     torch_dtype=torch.float16,
     device_map="auto"
 )
+
+print("Loading model...")
+if flash_attention_supported():
+    try:
+        model = AutoModelForCausalLM.from_pretrained(
+            model_path, attn_implementation="flash_attention_2", **load_kwargs
+        )
+        print("Using flash_attention_2")
+    except (ValueError, ImportError) as e:
+        print(f"flash_attention_2 unavailable for this model: {e}")
+        model = AutoModelForCausalLM.from_pretrained(model_path, **load_kwargs)
+else:
+    model = AutoModelForCausalLM.from_pretrained(model_path, **load_kwargs)
 print(f"Model class: {model.__class__.__name__}")
 
 print("Loading processor...")
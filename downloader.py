@@ -1,6 +1,7 @@
 import os
 import subprocess
 import logging
+import shutil
 import time # 追加
 from utils import setup_logger
 
@@ -11,9 +12,10 @@ class VideoDownloader:
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
         
-    def download(self, url: str) -> str:
+    def download(self, url: str, include_audio: bool = True) -> str:
         """
         Downloads video from URL using yt-dlp CLI.
+        include_audio=False fetches the video stream only (no audio download, no mux step).
         Returns the path to the downloaded video file.
         """
         logger.info(f"Starting download for: {url}")
@@ -24,19 +26,36 @@ class VideoDownloader:
         safe_filename = f"video_{int(time.time())}.mp4"
         output_path = os.path.join(self.output_dir, safe_filename)
         
+        # 解析（ミニマップ・OCR）には音声が不要なので、映像ストリームのみを取得してマージを省く
+        if include_audio:
+            video_format = "bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080][ext=mp4]/best"
+        else:
+            video_format = "bv*[height<=1080][ext=mp4]/best[height<=1080][ext=mp4]/best"
+
         # ダウンロード用コマンド
         # --restrict-filenames を付けると、スペースをアンダースコアに置換してくれるのでより安全です
         cmd_download = [
             "yt-dlp",
             "-o", output_path, # 出力パスを直接指定
-            "--format", "bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080][ext=mp4]/best",
+            "--format", video_format,
+            "--concurrent-fragments", "8", # DASH/HLS のフラグメントを並列取得
             "--no-warnings",
             "--restrict-filenames", # ファイル名を安全な文字のみにする
-            url
         ]
-        
+        # aria2c があればマルチコネクションでダウンロード
+        # （aria2c 使用時は --concurrent-fragments が効かないため、接続数は aria2c 側の -x/-s で指定する）
+        if shutil.which("aria2c"):
+            cmd_download += [
+                "--downloader", "aria2c",
+                "--downloader-args", "aria2c:-x 8 -s 8 -k 1M",
+            ]
+            downloader_name = "aria2c"
+        else:
+            downloader_name = "native"
+        cmd_download.append(url)
+
         try:
-            logger.info(f"Executing yt-dlp...")
+            logger.info(f"Executing yt-dlp (downloader: {downloader_name})...")
             subprocess.run(cmd_download, check=True)
             
             # 実際にファイルが存在するか最終確認
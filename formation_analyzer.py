@@ -1,12 +1,17 @@
 import numpy as np
-import json
 import os
 from typing import Dict, List, Tuple, Optional
 from scipy.spatial.distance import pdist, squareform
-from scipy.cluster.hierarchy import linkage, fcluster, dendrogram
-from scipy.spatial.distance import cosine
-from utils import setup_logger, ensure_dir
+from scipy.cluster.hierarchy import fcluster
+from utils import setup_logger, ensure_dir, write_json
 from position_analyzer import PositionAnalyzer, RoundPositions
+from formation_numba import NUMBA_AVAILABLE, pair_similarity
+
+# fastcluster is a drop-in replacement for scipy's linkage (same input and output)
+try:
+    from fastcluster import linkage
+except ImportError:
+    from scipy.cluster.hierarchy import linkage
 
 logger = setup_logger("FormationAnalyzer")
 
@@ -15,83 +20,55 @@ class FormationAnalyzer:
     def __init__(self, output_dir: str = "output"):
         self.output_dir = output_dir
         self.position_analyzer = PositionAnalyzer(output_dir)
+        # (round_num, team) -> (centroid, signature) of _signature_source;
+        # see invalidate()
+        self._signature_cache: Dict[
+            Tuple[int, str], Tuple[Tuple[float, float], Optional[np.ndarray]]
+        ] = {}
+        self._signature_source: Optional[Dict[int, RoundPositions]] = None
         ensure_dir(self.output_dir)
 
-    def calculate_centroid(
-        self, positions: List[Tuple[float, float]]
-    ) -> Tuple[float, float]:
+    def invalidate(self):
         """
-        Calculate centroid of positions
+        Forget cached per-round signatures (call when positions_data is
+        modified in place; a different positions_data object resets the
+        cache by itself)
         """
-        if not positions:
-            return (0.0, 0.0)
-
-        positions = np.array(positions)
-        centroid = np.mean(positions, axis=0)
-        return tuple(centroid)
+        self._signature_cache.clear()
+        self._signature_source = None
 
-    def calculate_distance_matrix(
-        self, positions: List[Tuple[float, float]]
-    ) -> np.ndarray:
+    def calculate_centroid(self, positions: np.ndarray) -> Tuple[float, float]:
         """
-        Calculate pairwise distance matrix
+        Calculate centroid of an (N, 2) positions array
         """
-        if len(positions) < 2:
-            return np.zeros((1, 1))
-
-        return squareform(pdist(positions, metric="euclidean"))
-
-    def normalize_by_max_distance(self, distance_matrix: np.ndarray) -> np.ndarray:
-        """
-        Normalize distance matrix by max distance (scale invariant)
-        """
-        max_dist = np.max(distance_matrix)
-        if max_dist == 0:
-            return distance_matrix
+        if positions is None or len(positions) == 0:
+            return (0.0, 0.0)
 
-        return distance_matrix / max_dist
-
-    def upper_triangular_vector(self, matrix: np.ndarray) -> np.ndarray:
-        """
-        Convert symmetric matrix to upper triangular vector
-        """
-        n = matrix.shape[0]
-        upper = []
-        for i in range(n):
-            for j in range(i + 1, n):
-                upper.append(matrix[i, j])
-        return np.array(upper)
+        if not isinstance(positions, np.ndarray):
+            positions = np.asarray(positions, dtype=np.float32)
+        return (
+            float(positions[:, 0].mean(dtype=np.float64)),
+            float(positions[:, 1].mean(dtype=np.float64)),
+        )
 
     def calculate_formation_similarity(
         self,
-        positions1: List[Tuple[float, float]],
-        positions2: List[Tuple[float, float]],
+        positions1: np.ndarray,
+        positions2: np.ndarray,
     ) -> float:
         """
         Calculate formation similarity using relative positions (rotation and scale invariant)
         """
-        if not positions1 or not positions2:
+        if len(positions1) == 0 or len(positions2) == 0:
             return 0.0
 
-        # Calculate centroids
-        centroid1 = self.calculate_centroid(positions1)
-        centroid2 = self.calculate_centroid(positions2)
-
-        # Calculate relative positions from centroid
-        rel_pos1 = [(p[0] - centroid1[0], p[1] - centroid1[1]) for p in positions1]
-        rel_pos2 = [(p[0] - centroid2[0], p[1] - centroid2[1]) for p in positions2]
-
-        # Calculate distance matrices
-        dist_matrix1 = self.calculate_distance_matrix(rel_pos1)
-        dist_matrix2 = self.calculate_distance_matrix(rel_pos2)
+        # Compiled single-pass kernel when numba is installed
+        if NUMBA_AVAILABLE:
+            return pair_similarity(positions1, positions2)
 
-        # Normalize by max distance (scale invariant)
-        norm_matrix1 = self.normalize_by_max_distance(dist_matrix1)
-        norm_matrix2 = self.normalize_by_max_distance(dist_matrix2)
-
-        # Convert to upper triangular vectors
-        vec1 = self.upper_triangular_vector(norm_matrix1)
-        vec2 = self.upper_triangular_vector(norm_matrix2)
+        # Condensed normalized distance vectors around each centroid
+        vec1 = self._round_signature(positions1)
+        vec2 = self._round_signature(positions2)
 
         if len(vec1) != len(vec2):
             # Different number of players
@@ -100,47 +77,132 @@ class FormationAnalyzer:
         if len(vec1) == 0:
             return 1.0  # Single player
 
-        # Calculate cosine similarity
-        similarity = 1.0 - cosine(vec1, vec2)
+        # Zero vectors (all players on one spot) have no direction and
+        # count as identical
+        if not vec1.any() or not vec2.any():
+            return 1.0
+
+        # Cosine similarity of unit vectors
+        similarity = float(np.dot(vec1, vec2))
 
         return max(0.0, min(1.0, similarity))
 
-    def calculate_all_similarities(
+    def _team_positions(self, round_positions: RoundPositions, team: str) -> np.ndarray:
+        if team == "attack":
+            return self.position_analyzer.get_attack_positions(round_positions)
+        return self.position_analyzer.get_defend_positions(round_positions)
+
+    def _round_signature(self, positions: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Condensed pairwise distances of a formation around its centroid,
+        scaled to unit L2 norm (rotation and scale invariant), so the cosine
+        similarity of two signatures is their dot product.
+        Returns None when there are no positions; an all-zero vector when
+        every player stands on the same spot.
+        """
+        if len(positions) == 0:
+            return None
+
+        # Pairwise distances are the same around the centroid as in place;
+        # float32 is plenty for minimap coordinates
+        signature = pdist(positions, metric="euclidean").astype(np.float32)
+
+        norm = np.linalg.norm(signature)
+        if norm > 0:
+            signature /= norm
+        return signature
+
+    def _get_round_features(
+        self, round_num: int, positions_data: Dict[int, RoundPositions], team: str
+    ) -> Tuple[Tuple[float, float], Optional[np.ndarray]]:
+        # The cache only holds entries for one positions_data at a time
+        if positions_data is not self._signature_source:
+            self._signature_cache.clear()
+            self._signature_source = positions_data
+
+        key = (round_num, team)
+        cached = self._signature_cache.get(key)
+        if cached is None:
+            positions = self._team_positions(positions_data[round_num], team)
+            cached = (
+                self.calculate_centroid(positions),
+                self._round_signature(positions),
+            )
+            self._signature_cache[key] = cached
+        return cached
+
+    def _get_signature(
+        self, round_num: int, positions_data: Dict[int, RoundPositions], team: str
+    ) -> Optional[np.ndarray]:
+        """
+        Cached _round_signature of one team's positions in one round
+        """
+        return self._get_round_features(round_num, positions_data, team)[1]
+
+    def calculate_condensed_distances(
         self, positions_data: Dict[int, RoundPositions], team: str = "attack"
     ) -> np.ndarray:
         """
-        Calculate similarity matrix for all rounds
+        Formation distances (1 - similarity) between all rounds, sorted by
+        round number, in scipy's condensed pdist layout
         """
         round_nums = sorted(positions_data.keys())
         n = len(round_nums)
 
-        if n < 2:
-            return np.eye(n)
+        signatures = {
+            round_num: self._get_signature(round_num, positions_data, team)
+            for round_num in round_nums
+        }
+
+        # Only formations with the same number of players are comparable;
+        # every other pair (and any empty formation) keeps distance 1
+        groups: Dict[int, List[int]] = {}
+        for i, round_num in enumerate(round_nums):
+            signature = signatures[round_num]
+            if signature is not None:
+                groups.setdefault(len(signature), []).append(i)
 
-        similarity_matrix = np.eye(n)
+        distances = np.ones(n * (n - 1) // 2, dtype=np.float32)
 
-        for i in range(n):
-            for j in range(i + 1, n):
-                round_i = round_nums[i]
-                round_j = round_nums[j]
+        for length, indices in groups.items():
+            if len(indices) < 2:
+                continue
 
-                pos_i = positions_data[round_i]
-                pos_j = positions_data[round_j]
+            gi, gj = np.triu_indices(len(indices), k=1)
 
-                if team == "attack":
-                    positions_i = self.position_analyzer.get_attack_positions(pos_i)
-                    positions_j = self.position_analyzer.get_attack_positions(pos_j)
-                else:
-                    positions_i = self.position_analyzer.get_defend_positions(pos_i)
-                    positions_j = self.position_analyzer.get_defend_positions(pos_j)
+            if length == 0:
+                # Single player formations are all alike
+                group_distances = 0.0
+            else:
+                # Unit signatures: the whole cosine matrix is one BLAS call
+                vectors = np.stack([signatures[round_nums[i]] for i in indices])
+                similarity = vectors @ vectors.T
+
+                # Zero vectors (all players on one spot) count as identical
+                flat = ~vectors.any(axis=1)
+                similarity[flat, :] = 1.0
+                similarity[:, flat] = 1.0
+                group_distances = 1.0 - np.clip(similarity[gi, gj], 0.0, 1.0)
+
+            # Scatter the group's condensed pairs into the full condensed vector
+            i, j = np.asarray(indices)[gi], np.asarray(indices)[gj]
+            distances[n * i - i * (i + 1) // 2 + (j - i - 1)] = group_distances
 
-                similarity = self.calculate_formation_similarity(
-                    positions_i, positions_j
-                )
+        return distances
 
-                similarity_matrix[i, j] = similarity
-                similarity_matrix[j, i] = similarity
+    def calculate_all_similarities(
+        self, positions_data: Dict[int, RoundPositions], team: str = "attack"
+    ) -> np.ndarray:
+        """
+        Calculate similarity matrix for all rounds
+        """
+        n = len(positions_data)
+        if n < 2:
+            return np.eye(n, dtype=np.float32)
 
+        distances = self.calculate_condensed_distances(positions_data, team)
+        similarity_matrix = 1.0 - squareform(distances)
+        np.fill_diagonal(similarity_matrix, 1.0)
         return similarity_matrix
 
     def cluster_formations(
@@ -159,14 +221,11 @@ class FormationAnalyzer:
         if n < 2:
             return {0: round_nums}
 
-        # Calculate similarity matrix
-        similarity_matrix = self.calculate_all_similarities(positions_data, team)
-
-        # Convert to distance matrix
-        distance_matrix = 1.0 - similarity_matrix
+        # Condensed distance vector (1 - similarity), fed to linkage as is
+        distances = self.calculate_condensed_distances(positions_data, team)
 
         # Hierarchical clustering
-        Z = linkage(squareform(distance_matrix), method="complete")
+        Z = linkage(distances, method="complete")
 
         # Cut tree at threshold
         cluster_labels = fcluster(Z, t=1.0 - similarity_threshold, criterion="distance")
@@ -203,17 +262,10 @@ class FormationAnalyzer:
         Generate a descriptive name for the cluster
         """
         # Calculate average centroid for the cluster
-        centroids = []
-
-        for round_num in rounds:
-            pos = positions_data[round_num]
-            if team == "attack":
-                positions = self.position_analyzer.get_attack_positions(pos)
-            else:
-                positions = self.position_analyzer.get_defend_positions(pos)
-
-            centroid = self.calculate_centroid(positions)
-            centroids.append(centroid)
+        centroids = [
+            self._get_round_features(round_num, positions_data, team)[0]
+            for round_num in rounds
+        ]
 
         if not centroids:
             return f"Formation {cluster_id}"
@@ -258,7 +310,9 @@ class FormationAnalyzer:
             }
             result["clusters"].append(cluster_data)
 
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(result, f, indent=4, ensure_ascii=False)
+        write_json(filepath, result)
 
         logger.info(f"Saved formation analysis to: {filepath}")
+
+        # This analysis is done; later calls may bring new positions_data
+        self.invalidate()
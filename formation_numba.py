@@ -0,0 +1,59 @@
+import numpy as np
+
+try:
+    from numba import njit
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+
+    @njit(cache=True, fastmath=True)
+    def _pair_similarity(p1, p2):
+        n = p1.shape[0]
+        if n == 0 or p2.shape[0] == 0 or p2.shape[0] != n:
+            return 0.0
+        if n == 1:
+            return 1.0
+
+        # Pairwise distances of both formations in pdist order, folded
+        # straight into the cosine sums. Distances do not change when the
+        # centroid is subtracted, and the scale normalization cancels out.
+        dot = 0.0
+        norm1 = 0.0
+        norm2 = 0.0
+        for i in range(n):
+            for j in range(i + 1, n):
+                dx1 = np.float64(p1[j, 0]) - p1[i, 0]
+                dy1 = np.float64(p1[j, 1]) - p1[i, 1]
+                dx2 = np.float64(p2[j, 0]) - p2[i, 0]
+                dy2 = np.float64(p2[j, 1]) - p2[i, 1]
+                d1 = np.sqrt(dx1 * dx1 + dy1 * dy1)
+                d2 = np.sqrt(dx2 * dx2 + dy2 * dy2)
+                dot += d1 * d2
+                norm1 += d1 * d1
+                norm2 += d2 * d2
+
+        # All players on one spot: no direction, counts as identical
+        if norm1 == 0.0 or norm2 == 0.0:
+            return 1.0
+
+        similarity = dot / np.sqrt(norm1 * norm2)
+        return min(1.0, max(0.0, similarity))
+
+
+def pair_similarity(p1: np.ndarray, p2: np.ndarray) -> float:
+    """
+    Formation similarity of two (N, 2) position arrays: cosine similarity of
+    their centroid-relative pairwise distances, clipped to [0, 1].
+    0 for empty or differently sized formations, 1 for single players.
+    Requires numba; check NUMBA_AVAILABLE first.
+    """
+    return float(
+        _pair_similarity(
+            np.ascontiguousarray(p1, dtype=np.float32).reshape(-1, 2),
+            np.ascontiguousarray(p2, dtype=np.float32).reshape(-1, 2),
+        )
+    )
@@ -6,11 +6,17 @@ import numpy as np
 
 logger = setup_logger("FrameExtractor")
 
+# この距離未満の前方移動は set() でシークせず grab() で読み飛ばす
+# （set() はキーフレームまで戻って GOP を丸ごとデコードし直すため）
+KEYFRAME_DISTANCE = 30
+
 class FrameExtractor:
-    def __init__(self, video_path: str, sample_rate: float = 2.0):
+    def __init__(self, video_path: str, sample_rate: float = 2.0, hw_decode: bool = False):
         self.video_path = video_path
         self.sample_rate = sample_rate
-        self.cap = cv2.VideoCapture(video_path)
+        self.cap = self._open_capture(video_path, hw_decode)
+        # 次に read() されるフレーム番号（不明な場合は None）
+        self._decoder_pos: Optional[int] = 0
         
         if not self.cap.isOpened():
             logger.error(f"Could not open video: {video_path}")
@@ -23,24 +29,58 @@ class FrameExtractor:
         self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         
         logger.info(f"Video opened: {self.width}x{self.height}, {self.fps} fps, {self.duration:.2f}s")
+
+    @staticmethod
+    def _open_capture(video_path: str, hw_decode: bool) -> cv2.VideoCapture:
+        """
+        hw_decode=True の場合、OpenCV の FFmpeg バックエンドでハードウェアデコード（NVDEC / VAAPI / D3D11 など）を要求する
+        非対応のビルドや環境では通常の CPU デコードで開き直す
+        """
+        if hw_decode and hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+            cap = cv2.VideoCapture(
+                video_path,
+                cv2.CAP_FFMPEG,
+                [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY],
+            )
+            if cap.isOpened():
+                accel = int(cap.get(cv2.CAP_PROP_HW_ACCELERATION))
+                if accel != cv2.VIDEO_ACCELERATION_NONE:
+                    logger.info(f"Hardware video decoding enabled (acceleration type {accel})")
+                return cap
+            cap.release()
+            logger.warning("Hardware video decoding unavailable, falling back to CPU decoding")
+        return cv2.VideoCapture(video_path)
         
+    def _read_frame_at(self, target_frame: int) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        target_frame を読み込む。近い前方なら grab() で読み飛ばし、遠い場合や後方のみ set() でシークする
+        """
+        # 注: cv2 は常に正確な pos_frames を返さないことがあるため、内部カウント(_decoder_pos)を優先します。
+        delta = None if self._decoder_pos is None else target_frame - self._decoder_pos
+        if delta is not None and 0 <= delta < KEYFRAME_DISTANCE:
+            for _ in range(delta):
+                if not self.cap.grab():
+                    self._decoder_pos = None
+                    return False, None
+        else:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
+
+        ret, frame = self.cap.read()
+        self._decoder_pos = target_frame + 1 if ret else None
+        return ret, frame
+
     def extract_frames(self) -> Generator[Tuple[int, float, np.ndarray], None, None]:
         frame_interval = int(self.fps / self.sample_rate)
         if frame_interval < 1: frame_interval = 1
-            
+
+        # 呼び出し側が cap を直接進めている場合があるため、最初のフレームだけは必ずシークする
+        self._decoder_pos = None
+
         current_frame = 0
         while current_frame < self.total_frames:
-            # 1. 目的のフレームへ移動
-            # 10フレーム以上離れている場合は set() でジャンプ、そうでなければ grab() で読み飛ばす
-            # 一般的に遠い距離の set() は高速ですが、近距離は grab() の方が速い場合があります。
+            # 目的のフレームへ移動してデコード
             target_frame = current_frame
-            
-            # 現在の再生位置を取得
-            # 注: cv2 は常に正確な pos_frames を返さないことがあるため、内部カウント(current_frame)を優先します。
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
-            
-            # 2. 目的のフレームをデコードして読み込む
-            ret, frame = self.cap.read()
+            ret, frame = self._read_frame_at(target_frame)
             if not ret:
                 break
                 
@@ -58,15 +98,18 @@ class FrameExtractor:
         if target_frame < 0: target_frame = 0
         if target_frame >= self.total_frames: return False
         self.cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
+        self._decoder_pos = target_frame
         return True
     
     def get_frame_at_time(self, time_sec: float) -> Optional[Tuple[int, float, np.ndarray]]:
         """指定した時間（秒）のフレームを取得する"""
-        target_frame = int(time_sec * self.fps)
+        return self.get_frame_at_index(int(time_sec * self.fps))
+
+    def get_frame_at_index(self, target_frame: int) -> Optional[Tuple[int, float, np.ndarray]]:
+        """指定したフレーム番号のフレームを取得する"""
         if target_frame < 0 or target_frame >= self.total_frames:
             return None
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
-        ret, frame = self.cap.read()
+        ret, frame = self._read_frame_at(target_frame)
         if not ret:
             return None
         timestamp = target_frame / self.fps
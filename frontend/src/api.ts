@@ -38,6 +38,14 @@ export const getStatus = async () => {
     return res.data;
 };
 
+// Server-Sent Events: called with the current status, then on every change.
+// EventSource reconnects by itself; the returned function closes the stream.
+export const subscribeStatus = (onStatus: (status: JobStatus) => void) => {
+    const source = new EventSource('/api/status/stream');
+    source.onmessage = (e) => onStatus(JSON.parse(e.data));
+    return () => source.close();
+};
+
 export const getRounds = async () => {
     const res = await api.get<RoundsResponse>('/api/rounds');
     return res.data;
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { Layout } from '../components/Layout';
-import { getStatus, stopAnalyze, type JobStatus } from '../api';
+import { subscribeStatus, stopAnalyze, type JobStatus } from '../api';
 import { Square, CheckCircle, AlertCircle } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 
@@ -10,19 +10,11 @@ export const Analysis: React.FC = () => {
     const navigate = useNavigate();
 
     useEffect(() => {
-        const poll = async () => {
-            try {
-                const s = await getStatus();
-                setStatus(s);
-                setShowStop(false); // リセット
-            } catch (e) {
-                console.error(e);
-            }
-        };
-
-        poll();
-        const interval = setInterval(poll, 1000);
-        return () => clearInterval(interval);
+        // ポーリングせず、状態が変わった時だけサーバーから受け取る (SSE)
+        return subscribeStatus((s) => {
+            setStatus(s);
+            setShowStop(false); // リセット
+        });
     }, []);
 
     // Modeless: 確認なしで停止可能 (インラインで状態表示)
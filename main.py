@@ -2,7 +2,6 @@ import argparse
 import sys
 from config import Config
 from utils import setup_logger, parse_timestamp
-from scouting_engine import ScoutingEngine
 
 logger = setup_logger("Main")
 
@@ -129,6 +128,9 @@ def main():
     if use_sessions:
         logger.info(f"Using session-based output structure")
 
+    # Deferred so that --help and argument errors do not load the pipeline
+    from scouting_engine import ScoutingEngine
+
     engine = ScoutingEngine(cfg, use_sessions=use_sessions)
 
     # Check if we only need to process existing rounds (no video processing)
@@ -3,14 +3,34 @@ from paddleocr import PaddleOCR
 from utils import setup_logger
 from typing import Tuple, List, Optional
 import os
+import re
 import cv2
 import sys
 import logging
+import threading
+from collections import OrderedDict
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
 logger = setup_logger("PaddleOCREngine")
 
+# OCR 結果キャッシュの最大エントリ数（LRU）
+OCR_CACHE_SIZE = 4096
+
+# タイマー文字列の正規化（空白除去、"." -> ":"、O/I -> 0/1）と 1:XX 形式のパターン
+# 秒は先頭 2 桁だけを見る（"1:305" のような後続ノイズは許容）
+_TIMER_TRANS = str.maketrans({" ": None, ".": ":", "O": "0", "I": "1"})
+_TIMER_RE = re.compile(r"0*1:([0-5]\d[^:]*|\d)")
+_ROUND_RE = re.compile(r"ROUND(\d+)")
+
+# この確信度を超えるタイマーが見つかった時点で残りのテキストの確認を打ち切る
+TIMER_CONFIDENT_SCORE = 0.9
+
 class PaddleOCREngine:
-    def __init__(self, model_path: str = None, device: str = "cuda"):
+    def __init__(self, model_path: str = None, device: str = "cuda", use_tensorrt: bool = True, precision: str = "fp16", rec_batch_size: int = 1):
         # 1. 環境変数の設定
         os.environ['DISABLE_MODEL_SOURCE_CHECK'] = 'True'
         
@@ -23,14 +43,34 @@ class PaddleOCREngine:
         
         try:
             # device が "cuda" なら "gpu" に変換（Paddleの慣習）
-            target_device = "gpu" if (device == "cuda" or device is True) else "cpu"
+            target_device = "gpu" if (device in ("cuda", "gpu") or device is True) else "cpu"
             
             logger.info(f"Attempting to initialize PaddleOCR with device={target_device}...")
             
-            self.ocr = PaddleOCR(
+            # タイマー ROI は 1 行しかないため、認識バッチを小さくして推論用ワークスペースの確保量を抑える
+            ocr_kwargs = dict(
                 device=target_device,
-                lang='en'
+                lang='en',
+                text_recognition_batch_size=rec_batch_size
             )
+
+            self.ocr = None
+            if target_device == "gpu" and use_tensorrt:
+                # TensorRT サブグラフ + FP16 で推論（TRT 非対応の Paddle では通常の推論にフォールバック）
+                # 構築済みエンジンは PaddleX がモデルディレクトリにキャッシュするため、2 回目以降はビルド不要
+                try:
+                    self.ocr = PaddleOCR(
+                        **ocr_kwargs,
+                        use_tensorrt=True,
+                        precision=precision,
+                        min_subgraph_size=15
+                    )
+                    logger.info(f"PaddleOCR TensorRT backend enabled (precision={precision})")
+                except Exception as e:
+                    logger.warning(f"TensorRT init failed, falling back to Paddle Inference: {e}")
+
+            if self.ocr is None:
+                self.ocr = PaddleOCR(**ocr_kwargs)
             
         except TypeError as e:
             logger.warning(f"Failed with 'device' argument, trying no-argument init: {e}")
@@ -39,6 +79,11 @@ class PaddleOCREngine:
         finally:
             sys.argv = argv_backup
             
+        # ROI フィンガープリント -> 解析済み OCR 結果
+        self._ocr_cache = OrderedDict()
+        # 1 つのエンジン（CUDA コンテキスト）を複数ジョブで共有できるよう、推論とキャッシュ操作を直列化する
+        self._lock = threading.Lock()
+
         logger.info("PaddleOCR 3.x initialized successfully.")
 
     def detect_timer(self, image: np.ndarray, roi: Tuple[int, int, int, int] = None) -> Tuple[bool, float]:
@@ -50,95 +95,169 @@ class PaddleOCREngine:
             return res[0][0], res[0][1]
         return False, 0.0
 
-    def detect_timer_batch(self, images: List[np.ndarray], rois: Optional[List[Tuple[int, int, int, int]]] = None) -> List[Tuple[bool, float, int]]:
+    @staticmethod
+    def crop_roi(image: np.ndarray, roi: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+        """
+        フレームからタイマー領域を切り出す（画像外にはみ出す部分はクリップ）
+        小さすぎて OCR できない場合は None を返す
+        """
+        x, y, w, h = roi
+        h_img, w_img = image.shape[:2]
+        x, y = max(0, x), max(0, y)
+        w, h = min(w, w_img - x), min(h, h_img - y)
+        if w <= 10 or h <= 10:
+            return None
+
+        crop_img = image[y:y+h, x:x+w]
+        # 連続メモリでない場合のみコピー（小さな ROI だけを保持し、フレーム全体は手放せる）
+        if not crop_img.flags.c_contiguous:
+            crop_img = np.ascontiguousarray(crop_img)
+        return crop_img
+
+    def detect_timer_batch(self, images: List[np.ndarray], rois: Optional[List[Tuple[int, int, int, int]]] = None, cropped: bool = False) -> List[Tuple[bool, float, int]]:
         """
         複数フレームを一括処理して、タイマーが検出されたインデックスのリストを返す
+        cropped=True の場合、images は crop_roi() で切り出し済みの ROI（失敗時は None）
         """
-        processed_imgs = []
+        if not images:
+            return []
+
+        # 切り出せなかったフレームは OCR に渡さず「未検出」とする（ダミー画像で推論を無駄にしない）
+        empty = (False, 0.0, None, None)
+        processed_imgs = [None] * len(images)
+        parsed = [empty] * len(images)
         for i, img in enumerate(images):
             roi = rois[i] if rois else None
-            if roi:
-                x, y, w, h = roi
-                h_img, w_img = img.shape[:2]
-                x, y = max(0, x), max(0, y)
-                w, h = min(w, w_img - x), min(h, h_img - y)
-                if w <= 10 or h <= 10:
-                    # ダミー画像を入れておく（バッチのインデックスを維持するため）
-                    processed_imgs.append(np.zeros((80, 80, 3), dtype=np.uint8))
-                    continue
-                
-                crop_img = img[y:y+h, x:x+w]
-                target_h = 80
-                scale = target_h / h
-                crop_img = cv2.resize(crop_img, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
-                processed_imgs.append(crop_img)
+            if cropped:
+                crop_img = img
+            elif roi:
+                crop_img = self.crop_roi(img, roi)
             else:
-                processed_imgs.append(img)
+                # OCR 側の入力コピーが 1 回の memcpy で済むよう連続メモリにしておく（ROI 経路は crop_roi / resize 済み）
+                processed_imgs[i] = None if img is None else np.ascontiguousarray(img, dtype=np.uint8)
+                continue
 
-        if not processed_imgs:
-            return []
+            if crop_img is None:
+                continue
+
+            target_h = 80
+            if crop_img.shape[0] != target_h:
+                scale = target_h / crop_img.shape[0]
+                # 縮小は INTER_AREA（エイリアシングが少なく、OpenCV の縮小専用 SIMD 経路）、拡大は従来どおり INTER_LINEAR
+                interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+                crop_img = cv2.resize(crop_img, None, fx=scale, fy=scale, interpolation=interpolation)
+            processed_imgs[i] = crop_img
+
+        # 同じ内容の ROI は OCR 結果を再利用する（暗転・遷移フレームや、二分探索で近いフレームが何度も来るため）
+        valid = [i for i, img in enumerate(processed_imgs) if img is not None]
+        keys = {i: self._fingerprint(processed_imgs[i]) for i in valid}
+        with self._lock:
+            misses = []
+            for i in valid:
+                cached = self._cache_get(keys[i])
+                if cached is None:
+                    misses.append(i)
+                else:
+                    parsed[i] = cached
+
+            if misses:
+                # バッチ推論 (PaddleOCR 3.x / PaddleX)
+                try:
+                    results = self.ocr.predict([processed_imgs[i] for i in misses])
+                except Exception as e:
+                    logger.error(f"Batch inference failed: {e}")
+                    return [(False, 0.0, i, None, None) for i in range(len(images))]
+
+                # predict() returns a generator or list of result objects
+                for i, res in zip(misses, results):
+                    parsed[i] = self._parse_result(res)
+                    self._cache_put(keys[i], parsed[i])
+
+        return [
+            (found, best_conf, i, detected_round, detected_timer_str)
+            for i, (found, best_conf, detected_round, detected_timer_str) in enumerate(parsed)
+        ]
 
-        # バッチ推論 (PaddleOCR 3.x / PaddleX)
+    def _fingerprint(self, image: np.ndarray) -> Tuple:
+        """
+        OCR キャッシュのキー（画像サイズ + 画素のハッシュ）
+        """
+        data = np.ascontiguousarray(image).tobytes()
+        if xxhash is not None:
+            return (image.shape, xxhash.xxh3_64_intdigest(data))
+        return (image.shape, hash(data))
+
+    def _cache_get(self, key: Tuple) -> Optional[Tuple]:
+        parsed = self._ocr_cache.get(key)
+        if parsed is not None:
+            self._ocr_cache.move_to_end(key)
+        return parsed
+
+    def _cache_put(self, key: Tuple, parsed: Tuple):
+        self._ocr_cache[key] = parsed
+        if len(self._ocr_cache) > OCR_CACHE_SIZE:
+            self._ocr_cache.popitem(last=False)
+
+    @staticmethod
+    def _result_texts(res) -> Tuple[Optional[list], Optional[list]]:
+        """
+        OCR 結果から認識テキストとスコアを取り出す
+        PaddleOCR 3.x の結果は dict なので直接参照する（res.json は結果全体を毎回 JSON 化するため避ける）
+        """
         try:
-            results = self.ocr.predict(processed_imgs)
-        except Exception as e:
-            logger.error(f"Batch inference failed: {e}")
-            return [(False, 0.0, i) for i in range(len(images))]
-        
-        detections = []
-        # predict() returns a generator or list of result objects
-        for i, res in enumerate(results):
+            return res['rec_texts'], res['rec_scores']
+        except (KeyError, TypeError):
             data = res.json
-            found = False
-            best_conf = 0.0
-            detected_round = None
-            
-            detected_timer_str = None
-            
             if 'res' in data and 'rec_texts' in data['res']:
-                texts = data['res']['rec_texts']
-                scores = data['res']['rec_scores']
-                
-                # 1. タイマー（1:XX形式）のチェック
-                # Coarse-to-Fine Searchでは、まず1:3x台を見つけて、そこから遡る
-                timer_found = False
-                for text, confidence in zip(texts, scores):
-                    text = str(text).replace(" ", "").upper().replace(".", ":")
-                    # 1:数字の形式を探す
-                    if ":" in text:
-                        parts = text.split(":")
-                        if len(parts) == 2:
-                            try:
-                                m = int(parts[0].replace("O", "0").replace("I", "1"))
-                                s_str = parts[1][:2] if len(parts[1]) >= 2 else parts[1]
-                                s = int(s_str.replace("O", "0").replace("I", "1"))
-                                if m == 1 and 0 <= s <= 59:
-                                    timer_found = True
-                                    best_conf = max(best_conf, confidence)
-                                    detected_timer_str = f"{m}:{s:02d}"
-                            except:
-                                pass
-                
-                # 2. "ROUND X" のチェック
-                has_round_keyword = False
-                for t in texts:
-                    t_clean = str(t).replace(" ", "").upper()
-                    if "ROUND" in t_clean:
-                        has_round_keyword = True
-                        num_part = t_clean.replace("ROUND", "")
-                        if num_part.isdigit():
-                            detected_round = int(num_part)
-                    elif t_clean.isdigit() and not detected_round:
-                        # "ROUND" の後に別の要素として数字が来ている場合
-                        detected_round = int(t_clean)
-
-                # 判定
-                if timer_found:
-                    found = True
-            
-            detections.append((found, best_conf, i, detected_round, detected_timer_str))
+                return data['res']['rec_texts'], data['res']['rec_scores']
+            return None, None
+
+    def _parse_result(self, res) -> Tuple[bool, float, Optional[int], Optional[str]]:
+        """
+        OCR 結果からタイマー（1:XX）とラウンド番号を取り出す
+        Returns: (found, best_conf, detected_round, detected_timer_str)
+        """
+        texts, scores = self._result_texts(res)
+        found = False
+        best_conf = 0.0
+        detected_round = None
+        
+        detected_timer_str = None
+        
+        if texts is not None:
+            # 1. タイマー（1:XX形式）のチェック
+            # Coarse-to-Fine Searchでは、まず1:3x台を見つけて、そこから遡る
+            timer_found = False
+            for text, confidence in zip(texts, scores):
+                # 1:数字の形式を探す（O/I の誤認識は 0/1 に読み替え）
+                match = _TIMER_RE.fullmatch(str(text).upper().translate(_TIMER_TRANS))
+                if match:
+                    timer_found = True
+                    best_conf = max(best_conf, float(confidence))
+                    detected_timer_str = f"1:{int(match.group(1)[:2]):02d}"
+                    # 十分に確信度の高いタイマーが見つかれば残りのテキストは見ない
+                    if confidence > TIMER_CONFIDENT_SCORE:
+                        break
             
-        return detections
+            # 2. "ROUND X" のチェック
+            has_round_keyword = False
+            for t in texts:
+                t_clean = str(t).replace(" ", "").upper()
+                if "ROUND" in t_clean:
+                    has_round_keyword = True
+                    match = _ROUND_RE.fullmatch(t_clean)
+                    if match:
+                        detected_round = int(match.group(1))
+                        break
+                elif t_clean.isdigit() and not detected_round:
+                    # "ROUND" の後に別の要素として数字が来ている場合
+                    detected_round = int(t_clean)
+
+            # 判定
+            if timer_found:
+                found = True
+        
+        return (found, best_conf, detected_round, detected_timer_str)
 
     def close(self):
         pass
\ No newline at end of file
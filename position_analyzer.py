@@ -1,12 +1,19 @@
 import json
 import os
-from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
-from utils import setup_logger, ensure_dir
-from agent_detector import AgentDetection
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional
+from dataclasses import dataclass, fields
+from utils import setup_logger, ensure_dir, write_json
+
+if TYPE_CHECKING:
+    from agent_detector import AgentDetection
 
 logger = setup_logger("PositionAnalyzer")
 
+# Per-round position files are written in the background by this many threads
+WRITER_THREADS = 4
+
 
 @dataclass
 class RoundPositions:
@@ -16,18 +23,29 @@ class RoundPositions:
     defend: List[Dict]
     minimap_file: str
 
+    def to_dict(self) -> Dict:
+        """
+        Field dict for serialization; unlike asdict() the agent lists are
+        shared, not deep-copied
+        """
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
 
 class PositionAnalyzer:
     def __init__(self, output_dir: str = "output"):
         self.output_dir = output_dir
         ensure_dir(self.output_dir)
 
+        # Per-round saves run on a small pool; flush() waits for them
+        self._writer = ThreadPoolExecutor(max_workers=WRITER_THREADS)
+        self._pending_writes: Dict[str, Future] = {}
+
     def analyze_round(
         self,
         round_num: int,
         timestamp: float,
         minimap_file: str,
-        detections: List[AgentDetection],
+        detections: List["AgentDetection"],
     ) -> RoundPositions:
         """
         Analyze detected agents and create position data
@@ -36,12 +54,22 @@ class PositionAnalyzer:
         attack_agents = []
         defend_agents = []
 
-        for det in detections:
+        # Round all coordinates and confidences in one pass (float64, so the
+        # values match Python's round() and serialize as short floats)
+        values = np.round(
+            np.array(
+                [(det.x, det.y, det.confidence) for det in detections],
+                dtype=np.float64,
+            ).reshape(-1, 3),
+            4,
+        ).tolist()
+
+        for det, (x, y, confidence) in zip(detections, values):
             agent_data = {
                 "agent": det.agent_name,
-                "x": round(det.x, 4),
-                "y": round(det.y, 4),
-                "confidence": round(det.confidence, 4),
+                "x": x,
+                "y": y,
+                "confidence": confidence,
             }
 
             if det.team == "attack":
@@ -67,25 +95,42 @@ class PositionAnalyzer:
 
         return positions
 
-    def save_positions(self, positions: RoundPositions):
+    def save_positions(self, positions: RoundPositions) -> Future:
         """
-        Save position data to JSON file
+        Save position data to JSON file in the background
+        Call flush() to wait until every pending file is written
         """
-        filename = f"round_{positions.round_num:02d}_positions.json"
-        filepath = os.path.join(self.output_dir, filename)
+        filepath = self._positions_path(positions.round_num)
+
+        # A newer save of the same round must not be overtaken by an older one
+        previous = self._pending_writes.pop(filepath, None)
+        if previous is not None:
+            previous.result()
 
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(asdict(positions), f, indent=4, ensure_ascii=False)
+        future = self._writer.submit(write_json, filepath, positions.to_dict())
+        self._pending_writes[filepath] = future
 
-        logger.debug(f"Saved positions: {filepath}")
+        logger.debug(f"Queued positions: {filepath}")
+        return future
+
+    def _positions_path(self, round_num: int) -> str:
+        return os.path.join(self.output_dir, f"round_{round_num:02d}_positions.json")
+
+    def flush(self):
+        """
+        Wait for all pending position writes; re-raises the first write error
+        """
+        pending, self._pending_writes = self._pending_writes, {}
+        for future in pending.values():
+            future.result()
 
     def load_positions(self, round_num: int) -> Optional[RoundPositions]:
         """
         Load position data from JSON file
         """
-        filename = f"round_{round_num:02d}_positions.json"
-        filepath = os.path.join(self.output_dir, filename)
+        filepath = self._positions_path(round_num)
 
+        self.flush()
         if not os.path.exists(filepath):
             return None
 
@@ -102,21 +147,26 @@ class PositionAnalyzer:
 
         positions_dict = {}
         for round_num, positions in all_positions.items():
-            positions_dict[f"round_{round_num:02d}"] = asdict(positions)
+            positions_dict[f"round_{round_num:02d}"] = positions.to_dict()
 
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(positions_dict, f, indent=4, ensure_ascii=False)
+        write_json(filepath, positions_dict)
+        self.flush()
 
         logger.info(f"Saved all positions to: {filepath}")
 
-    def get_attack_positions(self, round_positions: RoundPositions) -> List[tuple]:
+    def get_attack_positions(self, round_positions: RoundPositions) -> np.ndarray:
         """
-        Get attack positions as (x, y) tuples
+        Get attack positions as an (N, 2) float32 array of (x, y) rows
         """
-        return [(p["x"], p["y"]) for p in round_positions.attack]
+        return self._positions_array(round_positions.attack)
 
-    def get_defend_positions(self, round_positions: RoundPositions) -> List[tuple]:
+    def get_defend_positions(self, round_positions: RoundPositions) -> np.ndarray:
         """
-        Get defend positions as (x, y) tuples
+        Get defend positions as an (N, 2) float32 array of (x, y) rows
         """
-        return [(p["x"], p["y"]) for p in round_positions.defend]
+        return self._positions_array(round_positions.defend)
+
+    def _positions_array(self, players: List[Dict]) -> np.ndarray:
+        return np.array([(p["x"], p["y"]) for p in players], dtype=np.float32).reshape(
+            -1, 2
+        )
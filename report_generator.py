@@ -1,12 +1,84 @@
+import io
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, TextIO
 from datetime import datetime
-from utils import setup_logger
+from utils import setup_logger, atomic_open
 from position_analyzer import RoundPositions
 from formation_analyzer import FormationAnalyzer
 
 logger = setup_logger("ReportGenerator")
 
+# One line per detected agent in the round details
+AGENT_LINE_FORMAT = "- {agent} ({x:.2f}, {y:.2f}) - 信頼度: {confidence:.2%}"
+
+# HTML page around the converted markdown report
+HTML_HEADER = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>スカウティングレポート</title>
+    <style>
+        body {
+            font-family: "Helvetica Neue", Arial, "Hiragino Kaku Gothic ProN", "Hiragino Sans", Meiryo, sans-serif;
+            line-height: 1.6;
+            max-width: 1200px;
+            margin: 0 auto;
+            padding: 20px;
+            background-color: #f5f5f5;
+        }
+        h1, h2, h3 {
+            color: #333;
+            border-bottom: 2px solid #00a65a;
+            padding-bottom: 10px;
+        }
+        table {
+            border-collapse: collapse;
+            width: 100%;
+            margin: 20px 0;
+            background-color: white;
+        }
+        th, td {
+            border: 1px solid #ddd;
+            padding: 12px;
+            text-align: left;
+            vertical-align: top;
+        }
+        th {
+            background-color: #00a65a;
+            color: white;
+        }
+        tr:nth-child(even) {
+            background-color: #f9f9f9;
+        }
+        img {
+            max-width: 300px;
+            height: auto;
+            border: 1px solid #ddd;
+            border-radius: 4px;
+        }
+        .cluster {
+            background-color: white;
+            padding: 20px;
+            margin: 20px 0;
+            border-radius: 8px;
+            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+        }
+        code {
+            background-color: #f4f4f4;
+            padding: 2px 4px;
+            border-radius: 3px;
+        }
+    </style>
+</head>
+<body>
+    """
+
+HTML_FOOTER = """
+</body>
+</html>
+"""
+
 
 class ReportGenerator:
     def __init__(self, output_dir: str = "output"):
@@ -18,29 +90,37 @@ class ReportGenerator:
         clusters: Optional[Dict[int, List[int]]] = None,
         cluster_names: Optional[Dict[int, str]] = None,
         video_file: Optional[str] = None,
-    ) -> str:
+        out: Optional[TextIO] = None,
+    ) -> Optional[str]:
         """
         Generate markdown scouting report
+        Written straight to `out` when given (returns None), else returned as a string
         """
-        lines = []
+        buf = out if out is not None else io.StringIO()
+
+        def write_line(text: str):
+            buf.write(text)
+            buf.write("\n")
 
         # Title and metadata
-        lines.append("# スカウティングレポート")
-        lines.append("")
-        lines.append(f"生成日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        write_line("# スカウティングレポート")
+        write_line("")
+        write_line(f"生成日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         if video_file:
-            lines.append(f"ビデオ: {os.path.basename(video_file)}")
-        lines.append(f"総ラウンド数: {len(positions_data)}")
-        lines.append("")
+            write_line(f"ビデオ: {os.path.basename(video_file)}")
+        write_line(f"総ラウンド数: {len(positions_data)}")
+        write_line("")
 
         # Formation clusters section
         if clusters and cluster_names:
-            lines.append("---")
-            lines.append("")
-            lines.append("## 配置類似グループ")
-            lines.append("")
+            write_line("---")
+            write_line("")
+            write_line("## 配置類似グループ")
+            write_line("")
 
             for cluster_id, rounds in clusters.items():
+                # Sorted once for both the round list and the table
+                rounds = sorted(rounds)
                 cluster_name = cluster_names.get(cluster_id, f"Formation {cluster_id}")
 
                 # Calculate average similarity
@@ -50,18 +130,18 @@ class ReportGenerator:
                 else:
                     avg_similarity = "-"
 
-                lines.append(f"### 🎯 {cluster_name} (類似度: {avg_similarity})")
-                lines.append("")
-                lines.append(
-                    f"**所属ラウンド**: {', '.join([f'Round {r}' for r in sorted(rounds)])}"
+                write_line(f"### 🎯 {cluster_name} (類似度: {avg_similarity})")
+                write_line("")
+                write_line(
+                    f"**所属ラウンド**: {', '.join([f'Round {r}' for r in rounds])}"
                 )
-                lines.append("")
+                write_line("")
 
                 # Create table
-                lines.append("| ラウンド | 攻撃配置画像 | 防衛配置画像 | メモ |")
-                lines.append("|---------|------------|------------|------|")
+                write_line("| ラウンド | 攻撃配置画像 | 防衛配置画像 | メモ |")
+                write_line("|---------|------------|------------|------|")
 
-                for round_num in sorted(rounds):
+                for round_num in rounds:
                     if round_num not in positions_data:
                         continue
 
@@ -70,62 +150,57 @@ class ReportGenerator:
                     attack_count = len(pos.attack)
                     defend_count = len(pos.defend)
 
-                    lines.append(
+                    write_line(
                         f"| Round {round_num} "
                         f"(![{minimap_file}]({minimap_file})) "
                         f"|  "
                         f"|  |"
                     )
 
-                lines.append("")
-                lines.append("")
+                write_line("")
+                write_line("")
 
         # Detailed round information
-        lines.append("---")
-        lines.append("")
-        lines.append("## ラウンド別詳細")
-        lines.append("")
+        write_line("---")
+        write_line("")
+        write_line("## ラウンド別詳細")
+        write_line("")
 
-        for round_num in sorted(positions_data.keys()):
+        for round_num in sorted(positions_data):
             pos = positions_data[round_num]
 
-            lines.append(f"### Round {round_num} (1:40)")
-            lines.append("")
-            lines.append(f"**タイムスタンプ**: {pos.timestamp:.2f}s")
-            lines.append("")
+            write_line(f"### Round {round_num} (1:40)")
+            write_line("")
+            write_line(f"**タイムスタンプ**: {pos.timestamp:.2f}s")
+            write_line("")
 
             # Attack team
-            lines.append("**攻撃側**:")
+            write_line("**攻撃側**:")
             for agent in pos.attack:
-                lines.append(
-                    f"- {agent['agent']} ({agent['x']:.2f}, {agent['y']:.2f}) - 信頼度: {agent['confidence']:.2%}"
-                )
+                write_line(AGENT_LINE_FORMAT.format_map(agent))
 
-            lines.append("")
+            write_line("")
 
             # Defend team
-            lines.append("**防衛側**:")
+            write_line("**防衛側**:")
             for agent in pos.defend:
-                lines.append(
-                    f"- {agent['agent']} ({agent['x']:.2f}, {agent['y']:.2f}) - 信頼度: {agent['confidence']:.2%}"
-                )
+                write_line(AGENT_LINE_FORMAT.format_map(agent))
 
-            lines.append("")
-            lines.append(f"![Minimap]({pos.minimap_file})")
-            lines.append("")
-            lines.append("---")
-            lines.append("")
+            write_line("")
+            write_line(f"![Minimap]({pos.minimap_file})")
+            write_line("")
+            write_line("---")
+            write_line("")
 
         # Add notes section for manual editing
-        lines.append("")
-        lines.append("## メモ")
-        lines.append("")
-        lines.append("※ 手動で追加してください")
-        lines.append("")
-
-        markdown_content = "\n".join(lines)
+        write_line("")
+        write_line("## メモ")
+        write_line("")
+        write_line("※ 手動で追加してください")
 
-        return markdown_content
+        if out is None:
+            return buf.getvalue()
+        return None
 
     def save_report(self, markdown_content: str, filename: str = "scouting_report.md"):
         """
@@ -133,13 +208,35 @@ class ReportGenerator:
         """
         filepath = os.path.join(self.output_dir, filename)
 
-        with open(filepath, "w", encoding="utf-8") as f:
+        with atomic_open(filepath, "w", encoding="utf-8") as f:
             f.write(markdown_content)
 
         logger.info(f"Saved scouting report to: {filepath}")
 
         return filepath
 
+    def write_report(
+        self,
+        positions_data: Dict[int, RoundPositions],
+        clusters: Optional[Dict[int, List[int]]] = None,
+        cluster_names: Optional[Dict[int, str]] = None,
+        video_file: Optional[str] = None,
+        filename: str = "scouting_report.md",
+    ):
+        """
+        Generate the markdown report directly into a file
+        """
+        filepath = os.path.join(self.output_dir, filename)
+
+        with atomic_open(filepath, "w", encoding="utf-8") as f:
+            self.generate_markdown(
+                positions_data, clusters, cluster_names, video_file, out=f
+            )
+
+        logger.info(f"Saved scouting report to: {filepath}")
+
+        return filepath
+
     def generate_html_report(
         self, markdown_content: str, filename: str = "scouting_report.html"
     ):
@@ -157,76 +254,13 @@ class ReportGenerator:
             markdown_content, extensions=["tables", "fenced_code"]
         )
 
-        # Wrap in HTML template
-        html_template = f"""<!DOCTYPE html>
-<html lang="ja">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>スカウティングレポート</title>
-    <style>
-        body {{
-            font-family: "Helvetica Neue", Arial, "Hiragino Kaku Gothic ProN", "Hiragino Sans", Meiryo, sans-serif;
-            line-height: 1.6;
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 20px;
-            background-color: #f5f5f5;
-        }}
-        h1, h2, h3 {{
-            color: #333;
-            border-bottom: 2px solid #00a65a;
-            padding-bottom: 10px;
-        }}
-        table {{
-            border-collapse: collapse;
-            width: 100%;
-            margin: 20px 0;
-            background-color: white;
-        }}
-        th, td {{
-            border: 1px solid #ddd;
-            padding: 12px;
-            text-align: left;
-            vertical-align: top;
-        }}
-        th {{
-            background-color: #00a65a;
-            color: white;
-        }}
-        tr:nth-child(even) {{
-            background-color: #f9f9f9;
-        }}
-        img {{
-            max-width: 300px;
-            height: auto;
-            border: 1px solid #ddd;
-            border-radius: 4px;
-        }}
-        .cluster {{
-            background-color: white;
-            padding: 20px;
-            margin: 20px 0;
-            border-radius: 8px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        code {{
-            background-color: #f4f4f4;
-            padding: 2px 4px;
-            border-radius: 3px;
-        }}
-    </style>
-</head>
-<body>
-    {html_content}
-</body>
-</html>
-"""
-
         filepath = os.path.join(self.output_dir, filename)
 
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(html_template)
+        with atomic_open(filepath, "w", encoding="utf-8") as f:
+            # Static page head and tail around the converted report
+            f.write(HTML_HEADER)
+            f.write(html_content)
+            f.write(HTML_FOOTER)
 
         logger.info(f"Saved HTML report to: {filepath}")
 
@@ -1,30 +1,49 @@
 import sys
 import time
 import os
+import re
 import cv2
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Callable
 from config import Config
-from utils import setup_logger
-from downloader import VideoDownloader
-from frame_extractor import FrameExtractor
-from screenshot_manager import ScreenshotManager
+from utils import setup_logger, read_json, list_round_images
+from screenshot_manager import (
+    ScreenshotManager,
+    LEGACY_INDEX_FILE,
+    load_timestamp_index,
+)
 from session_manager import SessionManager
-from ocr_engine import PaddleOCREngine
-from agent_detector import AgentDetector
 from position_analyzer import PositionAnalyzer, RoundPositions
 from formation_analyzer import FormationAnalyzer
 from report_generator import ReportGenerator
 
+# Heavy video/OCR/detection modules (paddle, CUDA, numba) are imported where
+# they are used, so post-processing-only runs start quickly
+
 logger = setup_logger("ScoutingEngine")
 
+# Sample spacing (seconds) inside a coarse hit's window during refinement
+REFINE_STEP = 0.2
+
+# Timer strings in 1:30-1:39 (the OCR engine reports timers as "1:SS")
+_TIMER_130S_RE = re.compile(r"0*1:3\d")
+
 
 class ScoutingEngine:
     def __init__(
-        self, config: Config, use_sessions: bool = True, session_id: str = None
+        self,
+        config: Config,
+        use_sessions: bool = True,
+        session_id: str = None,
+        ocr_engine=None,
     ):
+        """
+        ocr_engine: an already loaded PaddleOCREngine to reuse (e.g. one
+        shared across server jobs); loaded on first use when omitted.
+        """
         self.cfg = config
         self.use_sessions = use_sessions
-        self.ocr_engine = None
+        self.ocr_engine = ocr_engine
         self.session_manager = None
         self.screenshot_manager = ScreenshotManager(
             config.output_dir, use_sessions=use_sessions
@@ -39,6 +58,8 @@ class ScoutingEngine:
         if self.ocr_engine is None:
             try:
                 logger.info("Loading OCR Engine...")
+                from ocr_engine import PaddleOCREngine
+
                 self.ocr_engine = PaddleOCREngine(self.cfg.ocr_lang, self.cfg.use_gpu)
             except Exception as e:
                 logger.critical(f"Failed to initialize OCR Engine: {e}")
@@ -65,16 +86,7 @@ class ScoutingEngine:
         return -1
 
     def is_timer_in_130s(self, timer_str: str) -> bool:
-        if not timer_str:
-            return False
-        try:
-            parts = timer_str.split(":")
-            if len(parts) != 2:
-                return False
-            m, s = int(parts[0]), int(parts[1])
-            return m == 1 and 30 <= s <= 39
-        except:
-            return False
+        return bool(timer_str) and _TIMER_130S_RE.fullmatch(timer_str) is not None
 
     def process_video(
         self,
@@ -98,9 +110,14 @@ class ScoutingEngine:
             video_path = None
 
         if not video_path and self.cfg.video_url:
+            from downloader import VideoDownloader
+
             downloader = VideoDownloader("downloads")
             try:
-                video_path = downloader.download(self.cfg.video_url)
+                # Only frames are analyzed, so skip the audio stream
+                video_path = downloader.download(
+                    self.cfg.video_url, include_audio=False
+                )
             except Exception as e:
                 logger.critical("Failed to download video.")
                 raise e
@@ -116,7 +133,11 @@ class ScoutingEngine:
             self.session_manager.update_session_status("processing")
 
         # 3. Init Frame Extractor
-        frame_extractor = FrameExtractor(video_path, self.cfg.frame_sample_rate)
+        from frame_extractor import FrameExtractor
+
+        frame_extractor = FrameExtractor(
+            video_path, self.cfg.frame_sample_rate, hw_decode=self.cfg.hw_decode
+        )
 
         # Apply dynamic scaling
         self.cfg.scale_coords(frame_extractor.width, frame_extractor.height)
@@ -127,6 +148,7 @@ class ScoutingEngine:
         # Coarse search settings
         COARSE_STEP = 5.0
         SKIP_AMOUNT = 60.0
+        COARSE_BATCH_SIZE = max(1, self.cfg.coarse_batch_size)  # samples per OCR call
 
         current_time = self.cfg.start_time if self.cfg.start_time is not None else 0.0
         duration = (
@@ -135,6 +157,12 @@ class ScoutingEngine:
             else frame_extractor.duration
         )
 
+        # OCR runs on a worker thread so the next batch is decoded meanwhile;
+        # the frame extractor itself is only ever used from this thread
+        ocr_pool = ThreadPoolExecutor(max_workers=1)
+        prefetched = None
+        scan_failed = False
+
         try:
             while current_time < duration:
                 if self.stop_requested:
@@ -147,20 +175,51 @@ class ScoutingEngine:
                     )
 
                 # Phase 1: Coarse Search
-                result = frame_extractor.get_frame_at_time(current_time)
-                if result is None:
-                    current_time += COARSE_STEP
-                    continue
+                # Collect up to COARSE_BATCH_SIZE sample points, one OCR call for all.
+                # Only the timer ROI of each frame is kept for OCR.
+                if prefetched is not None:
+                    batch, sample_time = prefetched
+                    prefetched = None
+                else:
+                    batch, sample_time = self._collect_timer_rois(
+                        frame_extractor,
+                        current_time,
+                        duration,
+                        COARSE_STEP,
+                        COARSE_BATCH_SIZE,
+                    )
 
-                frame_idx, timestamp, frame = result
+                if not batch:
+                    current_time = sample_time
+                    continue
 
-                # OCR Batch Detection
-                detections = self.ocr_engine.detect_timer_batch(
-                    [frame], [self.cfg.timer_coords]
+                # OCR Batch Detection, overlapped with decoding the following batch
+                # (dropped again if this batch has a hit and the search skips ahead)
+                future = ocr_pool.submit(
+                    self.ocr_engine.detect_timer_batch,
+                    [timer_roi for _, _, timer_roi in batch],
+                    cropped=True,
                 )
-                detected, confidence, _, det_round, det_timer = detections[0]
-
-                if detected and det_timer and self.is_timer_in_130s(det_timer):
+                if sample_time < duration:
+                    prefetched = self._collect_timer_rois(
+                        frame_extractor,
+                        sample_time,
+                        duration,
+                        COARSE_STEP,
+                        COARSE_BATCH_SIZE,
+                    )
+                detections = future.result()
+
+                # First sample point showing 1:3x, if any
+                hit = None
+                for (_, timestamp, _), detection in zip(batch, detections):
+                    det_timer = detection[4]
+                    if detection[0] and det_timer and self.is_timer_in_130s(det_timer):
+                        hit = (timestamp, det_timer)
+                        break
+
+                if hit:
+                    timestamp, det_timer = hit
                     logger.info(
                         f"Coarse: 1:3x detected at {timestamp:.2f}s ({det_timer}). Rewinding..."
                     )
@@ -199,24 +258,57 @@ class ScoutingEngine:
 
                     # Phase 3: Skip
                     current_time = timestamp + SKIP_AMOUNT
+                    prefetched = None
                 else:
-                    current_time += COARSE_STEP
+                    current_time = sample_time
 
         except Exception as e:
+            scan_failed = True
             logger.error(f"Error processing video: {e}")
             if self.use_sessions and self.session_manager:
                 self.session_manager.update_session_status("failed", round_count)
             raise e
         finally:
+            ocr_pool.shutdown()
             frame_extractor.release()
+            # Round screenshots are encoded in the background; wait for them.
+            # A save error must not replace the exception of a failed scan.
+            try:
+                self.screenshot_manager.flush()
+            except Exception as e:
+                if not scan_failed:
+                    raise
+                logger.error(f"Error saving round screenshots: {e}")
             logger.info(f"Processing complete. Detected {round_count} rounds.")
 
             if self.use_sessions and self.session_manager:
                 self.session_manager.update_session_status("completed", round_count)
 
+    def _collect_timer_rois(
+        self, frame_extractor, start_time, end_time, step, max_samples=None
+    ):
+        """
+        Timer ROIs of sample points every `step` seconds in [start_time,
+        end_time), at most max_samples of them.
+        Returns ([(frame_idx, timestamp, timer_roi)], next_time)
+        """
+        batch = []
+        sample_time = start_time
+        while sample_time < end_time and (
+            max_samples is None or len(batch) < max_samples
+        ):
+            result = frame_extractor.get_frame_at_time(sample_time)
+            if result is not None:
+                frame_idx, timestamp, frame = result
+                timer_roi = self.ocr_engine.crop_roi(frame, self.cfg.timer_coords)
+                batch.append((frame_idx, timestamp, timer_roi))
+            sample_time += step
+        return batch, sample_time
+
     def _refine_search(self, frame_extractor, low, high):
         """
-        Binary search refinement logic
+        Refine a coarse hit: OCR every REFINE_STEP seconds of [low, high) in
+        one batch and keep the frame whose timer is closest to 1:40
         """
         best_frame = None
         best_timestamp = 0.0
@@ -224,46 +316,35 @@ class ScoutingEngine:
         best_round = None
         best_score = -1
 
-        while (high - low) > 0.1:
-            mid = (low + high) / 2
-            ref_result = frame_extractor.get_frame_at_time(mid)
-            if ref_result is None:
-                low = mid
-                continue
+        # Close samples are reached with grab(), so the window decodes
+        # sequentially after a single seek
+        samples, _ = self._collect_timer_rois(frame_extractor, low, high, REFINE_STEP)
+        if not samples:
+            return None
 
-            ref_idx, ref_ts, ref_frame = ref_result
-            ref_detections = self.ocr_engine.detect_timer_batch(
-                [ref_frame], [self.cfg.timer_coords]
-            )
-            ref_detected, ref_conf, _, ref_round, ref_timer = ref_detections[0]
+        ref_detections = self.ocr_engine.detect_timer_batch(
+            [timer_roi for _, _, timer_roi in samples], cropped=True
+        )
 
+        for (ref_idx, ref_ts, _), detection in zip(samples, ref_detections):
+            ref_round, ref_timer = detection[3], detection[4]
             score = self.get_refinement_score(ref_timer)
 
-            if score >= 100:
-                low = mid
-                if score > best_score or (
-                    score == best_score and ref_ts > best_timestamp
-                ):
-                    best_score = score
-                    best_frame = ref_frame
-                    best_timestamp = ref_ts
-                    best_timer = ref_timer
-                    if ref_round:
-                        best_round = ref_round
-            elif score > 0:
-                high = mid
-                if score > best_score:
-                    best_score = score
-                    best_frame = ref_frame
-                    best_timestamp = ref_ts
-                    best_timer = ref_timer
-                    if ref_round:
-                        best_round = ref_round
-            else:
-                low = mid
+            # 1:40 and above: prefer the latest frame; 1:3x: the earliest
+            if score > best_score or (score >= 100 and score == best_score):
+                best_score = score
+                best_frame = ref_idx
+                best_timestamp = ref_ts
+                best_timer = ref_timer
+                if ref_round:
+                    best_round = ref_round
 
         if best_frame is not None and best_score >= 35:
-            return best_frame, best_timestamp, best_round, best_score, best_timer
+            # Only the ROIs were kept; decode the chosen frame once more
+            result = frame_extractor.get_frame_at_index(best_frame)
+            if result is None:
+                return None
+            return result[2], best_timestamp, best_round, best_score, best_timer
         return None
 
     def run_post_processing(
@@ -295,6 +376,8 @@ class ScoutingEngine:
 
     def _run_agent_detection(self, analyzer, positions_data):
         logger.info("Detecting agent positions...")
+        from agent_detector import AgentDetector
+
         agent_detector = AgentDetector(
             icons_dir=self.cfg.agent_icons_dir,
             detection_threshold=self.cfg.detection_threshold,
@@ -302,58 +385,49 @@ class ScoutingEngine:
             team_color_offset=self.cfg.team_color_offset,
         )
 
-        round_files = sorted(
-            [
-                f
-                for f in os.listdir(self.cfg.output_dir)
-                if f.startswith("round_")
-                and f.endswith(".png")
-                and "_full" not in f
-                and "_positions" not in f
-            ]
+        timestamps = load_timestamp_index(
+            os.path.join(self.cfg.output_dir, LEGACY_INDEX_FILE)
         )
-
-        for round_file in round_files:
-            try:
-                round_num = int(round_file.replace("round_", "").replace(".png", ""))
-            except ValueError:
-                continue
-
-            minimap_path = os.path.join(self.cfg.output_dir, round_file)
-            minimap_img = cv2.imread(minimap_path)
-            if minimap_img is None:
-                continue
-
-            # Load metadata
-            metadata_file = os.path.join(
-                self.cfg.output_dir, f"round_{round_num:02d}_metadata.json"
+        round_images = list_round_images(self.cfg.output_dir)
+
+        # detect() already spreads one minimap over the detector's match pool,
+        # so rounds are detected one at a time; only the PNG decoding runs
+        # ahead on a reader thread
+        with ThreadPoolExecutor(max_workers=1) as reader:
+            minimaps = reader.map(
+                cv2.imread,
+                [os.path.join(self.cfg.output_dir, f) for _, f in round_images],
             )
-            timestamp = 0.0
-            if os.path.exists(metadata_file):
-                import json
+            for (round_num, round_file), minimap_img in zip(round_images, minimaps):
+                if minimap_img is None:
+                    continue
 
-                with open(metadata_file, "r") as f:
-                    timestamp = json.load(f).get("timestamp", 0.0)
+                timestamp = timestamps.get(round_num)
+                if timestamp is None:
+                    # Output written before the timestamp index existed
+                    metadata_file = os.path.join(
+                        self.cfg.output_dir, f"round_{round_num:02d}_metadata.json"
+                    )
+                    timestamp = 0.0
+                    if os.path.exists(metadata_file):
+                        timestamp = read_json(metadata_file).get("timestamp", 0.0)
 
-            detections = agent_detector.detect(minimap_img)
-            positions = analyzer.analyze_round(
-                round_num, timestamp, round_file, detections
-            )
-            analyzer.save_positions(positions)
-            positions_data[round_num] = positions
+                detections = agent_detector.detect(minimap_img)
+                positions = analyzer.analyze_round(
+                    round_num, timestamp, round_file, detections
+                )
+                analyzer.save_positions(positions)
+                positions_data[round_num] = positions
 
         analyzer.save_all_positions(positions_data)
 
     def _load_existing_positions(self, positions_data):
-        import json
-
         all_positions_file = os.path.join(self.cfg.output_dir, "all_positions.json")
         if os.path.exists(all_positions_file):
-            with open(all_positions_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                for key, value in data.items():
-                    round_num = int(key.replace("round_", ""))
-                    positions_data[round_num] = RoundPositions(**value)
+            data = read_json(all_positions_file)
+            for key, value in data.items():
+                round_num = int(key.replace("round_", ""))
+                positions_data[round_num] = RoundPositions(**value)
             logger.info(f"Loaded {len(positions_data)} rounds.")
 
     def _run_clustering(self, positions_data):
@@ -379,10 +453,18 @@ class ScoutingEngine:
     ):
         logger.info("Generating report...")
         generator = ReportGenerator(self.cfg.output_dir)
-        content = generator.generate_markdown(
-            positions_data, clusters, cluster_names, video_source
-        )
-
-        generator.save_report(content, "scouting_report.md")
         if fmt == "html":
+            content = generator.generate_markdown(
+                positions_data, clusters, cluster_names, video_source
+            )
+            generator.save_report(content, "scouting_report.md")
             generator.generate_html_report(content, "scouting_report.html")
+        else:
+            # Markdown only: stream the report into the file
+            generator.write_report(
+                positions_data,
+                clusters,
+                cluster_names,
+                video_source,
+                "scouting_report.md",
+            )
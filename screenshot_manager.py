@@ -1,13 +1,32 @@
 import os
 import cv2
-import json
 import numpy as np
-from typing import Optional
-from utils import setup_logger, ensure_dir
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+from utils import setup_logger, ensure_dir, read_json, write_json
 from session_manager import SessionManager
 
 logger = setup_logger("ScreenshotManager")
 
+# Full-frame screenshots are only for viewing, so they are stored lossy;
+# minimaps stay PNG because agent detection runs on them
+FULL_SCREENSHOT_EXT = ".jpg"
+FULL_SCREENSHOT_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, 85]
+
+# Round -> timestamp of every round saved in the legacy layout, so agent
+# detection need not open each round_NN_metadata.json. Lives next to the
+# per-round metadata files in the flat output dir.
+LEGACY_INDEX_FILE = "metadata_index.json"
+
+
+def load_timestamp_index(path: str) -> Dict[int, float]:
+    """
+    Load a round timestamp index; empty if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return {}
+    return {int(k): v for k, v in read_json(path).items()}
+
 
 class ScreenshotManager:
     def __init__(self, output_dir: str, use_sessions: bool = True):
@@ -16,6 +35,12 @@ class ScreenshotManager:
         self.session_manager: Optional[SessionManager] = None
         ensure_dir(self.output_dir)
 
+        # PNG encoding runs off the caller's thread; flush() waits for it
+        self._writer = ThreadPoolExecutor(max_workers=1)
+        self._pending_saves: List[Future] = []
+        # Timestamp index per index file path, written out by flush()
+        self._timestamp_indexes: Dict[str, Dict[int, float]] = {}
+
     def set_session_manager(self, session_manager: SessionManager):
         """
         Set the session manager for session-based output.
@@ -33,20 +58,55 @@ class ScreenshotManager:
         timestamp: float,
         minimap_roi: tuple,
         full_screenshot: bool = False,
-    ):
+    ) -> Future:
         """
         Saves the minimap and optionally full screenshot for a round.
         Uses session-based directory structure if session_manager is set,
         otherwise falls back to legacy flat structure.
+        Files are written in the background; call flush() to wait for them.
         """
         if self.use_sessions and self.session_manager:
-            self._save_round_session(
-                frame, round_num, timestamp, minimap_roi, full_screenshot
-            )
+            save = self._save_round_session
         else:
-            self._save_round_legacy(
-                frame, round_num, timestamp, minimap_roi, full_screenshot
-            )
+            save = self._save_round_legacy
+            index_path = os.path.join(self.output_dir, LEGACY_INDEX_FILE)
+            if index_path not in self._timestamp_indexes:
+                # Merge into what earlier runs left behind
+                self._timestamp_indexes[index_path] = load_timestamp_index(index_path)
+            self._timestamp_indexes[index_path][round_num] = timestamp
+
+        future = self._writer.submit(
+            save, frame, round_num, timestamp, minimap_roi, full_screenshot
+        )
+        self._pending_saves.append(future)
+        return future
+
+    def flush(self):
+        """
+        Wait for all pending round saves, then write the timestamp indexes;
+        re-raises the first save error.
+        """
+        pending, self._pending_saves = self._pending_saves, []
+        for future in pending:
+            future.result()
+
+        indexes, self._timestamp_indexes = self._timestamp_indexes, {}
+        for index_path, index in indexes.items():
+            ensure_dir(os.path.dirname(index_path))
+            write_json(index_path, {str(k): index[k] for k in sorted(index)})
+
+    @staticmethod
+    def _crop_minimap(frame: np.ndarray, minimap_roi: tuple) -> np.ndarray:
+        """
+        View of the minimap region, with the ROI clamped to the frame.
+        """
+        x, y, w, h = minimap_roi
+        h_img, w_img = frame.shape[:2]
+        x = max(0, min(x, w_img))
+        y = max(0, min(y, h_img))
+        w = max(1, min(w, w_img - x))
+        h = max(1, min(h, h_img - y))
+        return frame[y : y + h, x : x + w]
 
     def _save_round_session(
         self,
@@ -69,23 +129,16 @@ class ScreenshotManager:
         ensure_dir(metadata_dir)
         ensure_dir(full_screenshots_dir)
 
-        x, y, w, h = minimap_roi
-        h_img, w_img = frame.shape[:2]
-        x = max(0, min(x, w_img))
-        y = max(0, min(y, h_img))
-        w = max(1, min(w, w_img - x))
-        h = max(1, min(h, h_img - y))
-
-        minimap_img = frame[y : y + h, x : x + w]
+        minimap_img = self._crop_minimap(frame, minimap_roi)
         minimap_filename = f"round_{round_num:02d}.png"
         minimap_path = os.path.join(minimaps_dir, minimap_filename)
         cv2.imwrite(minimap_path, minimap_img)
         logger.info(f"Saved minimap: {minimap_path}")
 
         if full_screenshot:
-            full_filename = f"round_{round_num:02d}_full.png"
+            full_filename = f"round_{round_num:02d}_full{FULL_SCREENSHOT_EXT}"
             full_path = os.path.join(full_screenshots_dir, full_filename)
-            cv2.imwrite(full_path, frame)
+            cv2.imwrite(full_path, frame, FULL_SCREENSHOT_PARAMS)
 
         metadata = {
             "round": round_num,
@@ -97,8 +150,7 @@ class ScreenshotManager:
 
         meta_filename = f"round_{round_num:02d}_metadata.json"
         meta_path = os.path.join(metadata_dir, meta_filename)
-        with open(meta_path, "w", encoding="utf-8") as f:
-            json.dump(metadata, f, indent=4, ensure_ascii=False)
+        write_json(meta_path, metadata)
 
     def _save_round_legacy(
         self,
@@ -113,23 +165,16 @@ class ScreenshotManager:
         """
         ensure_dir(self.output_dir)
 
-        x, y, w, h = minimap_roi
-        h_img, w_img = frame.shape[:2]
-        x = max(0, min(x, w_img))
-        y = max(0, min(y, h_img))
-        w = max(1, min(w, w_img - x))
-        h = max(1, min(h, h_img - y))
-
-        minimap_img = frame[y : y + h, x : x + w]
+        minimap_img = self._crop_minimap(frame, minimap_roi)
         minimap_filename = f"round_{round_num:02d}.png"
         minimap_path = os.path.join(self.output_dir, minimap_filename)
         cv2.imwrite(minimap_path, minimap_img)
         logger.info(f"Saved minimap: {minimap_path}")
 
         if full_screenshot:
-            full_filename = f"round_{round_num:02d}_full.png"
+            full_filename = f"round_{round_num:02d}_full{FULL_SCREENSHOT_EXT}"
             full_path = os.path.join(self.output_dir, full_filename)
-            cv2.imwrite(full_path, frame)
+            cv2.imwrite(full_path, frame, FULL_SCREENSHOT_PARAMS)
 
         metadata = {
             "round": round_num,
@@ -139,7 +184,4 @@ class ScreenshotManager:
         }
 
         meta_filename = f"round_{round_num:02d}_metadata.json"
-        with open(
-            os.path.join(self.output_dir, meta_filename), "w", encoding="utf-8"
-        ) as f:
-            json.dump(metadata, f, indent=4, ensure_ascii=False)
+        write_json(os.path.join(self.output_dir, meta_filename), metadata)
@@ -1,21 +1,41 @@
 import uvicorn
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Response
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import os
-import glob
+import asyncio
+import copy
+import json
+import time
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 import threading
 import uuid
+from dataclasses import asdict, dataclass
 from config import Config
 from scouting_engine import ScoutingEngine
 from session_manager import SessionManager
-from utils import setup_logger
+from utils import setup_logger, list_round_images
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = setup_logger("Server")
 
-app = FastAPI(title="Valorant Scouting Tool API")
+app = FastAPI(
+    title="Valorant Scouting Tool API",
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse,
+)
+
+
+def _dumps(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -26,12 +46,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Round images keep their names when an analysis is re-run, so they are not
+# immutable: let browsers reuse them briefly, then revalidate (StaticFiles
+# already sends ETag/Last-Modified and answers If-None-Match with 304)
+STATIC_CACHE_CONTROL = "public, max-age=60"
+
+
+class CachedStaticFiles(StaticFiles):
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = STATIC_CACHE_CONTROL
+        return response
+
+
+# Default config, built once. Jobs work on a copy because scale_coords
+# rewrites the ROI fields in place.
+_DEFAULT_CFG = Config()
+
 # Serve static files (output directory)
-default_output = Config().output_dir
-if not os.path.exists(default_output):
-    os.makedirs(default_output)
+default_output = _DEFAULT_CFG.output_dir
+os.makedirs(default_output, exist_ok=True)
 
-app.mount("/static", StaticFiles(directory=default_output), name="static")
+app.mount("/static", CachedStaticFiles(directory=default_output), name="static")
 
 # Session Manager
 session_manager = SessionManager(default_output)
@@ -39,10 +75,11 @@ session_manager = SessionManager(default_output)
 # Serve sessions static files
 sessions_dir = os.path.join(default_output, "sessions")
 if os.path.exists(sessions_dir):
-    app.mount("/sessions", StaticFiles(directory=sessions_dir), name="sessions")
+    app.mount("/sessions", CachedStaticFiles(directory=sessions_dir), name="sessions")
 
 
 # Global State
+@dataclass(slots=True)
 class JobState:
     id: str = None
     is_running: bool = False
@@ -50,10 +87,68 @@ class JobState:
     status: str = "idle"
     current_time: float = 0.0
 
+    def update(self, **fields):
+        """Set several fields at once; /api/status never sees half an update."""
+        with _job_lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+        _notify_status_changed()
+
+    def snapshot(self) -> dict:
+        with _job_lock:
+            return asdict(self)
 
+
+_job_lock = threading.Lock()
 current_job = JobState()
+
+# /api/status/stream listeners wait on _status_event; a change sets it and
+# swaps in a fresh one, so every listener wakes once per change. Both are
+# created by the first stream request, on the server's event loop.
+_status_loop: Optional[asyncio.AbstractEventLoop] = None
+_status_event: Optional[asyncio.Event] = None
+STATUS_STREAM_KEEPALIVE_SEC = 15.0
+
+
+def _notify_status_changed():
+    """Wake the status stream listeners; callable from any thread."""
+    if _status_loop is not None:
+        _status_loop.call_soon_threadsafe(_wake_status_listeners)
+
+
+def _wake_status_listeners():
+    global _status_event
+    event, _status_event = _status_event, asyncio.Event()
+    event.set()
+
 engine_instance: Optional[ScoutingEngine] = None
 
+# session_id -> (minimaps/full_screenshots mtimes, ETag, JSON body) of the
+# /api/sessions/{id}/rounds response
+_session_rounds_cache: Dict[str, Tuple[Tuple[int, int], str, bytes]] = {}
+ROUNDS_CACHE_SETTLE_NS = 1_000_000_000
+
+# /api/rounds response and the directory mtimes it was built from; the lock
+# also makes concurrent polls wait for one rebuild instead of each scanning
+_rounds_cache = {"stamp": None, "data": None}
+_rounds_cache_lock = threading.Lock()
+
+# OCR engine shared by all jobs: loading PaddleOCR (CUDA context, model
+# weights, TensorRT engines) takes seconds, and several contexts on one GPU
+# contend with each other. Created by the first job that needs it.
+_ocr_engine = None
+_ocr_engine_lock = threading.Lock()
+
+
+def get_ocr_engine():
+    global _ocr_engine
+    with _ocr_engine_lock:
+        if _ocr_engine is None:
+            from ocr_engine import PaddleOCREngine
+
+            _ocr_engine = PaddleOCREngine(_DEFAULT_CFG.ocr_lang, _DEFAULT_CFG.use_gpu)
+        return _ocr_engine
+
 
 # Pydantic Models
 class AnalyzeRequest(BaseModel):
@@ -84,44 +179,44 @@ class SessionInfo(BaseModel):
 
 # Background Task
 def run_analysis_task(job_id: str, req: AnalyzeRequest):
-    global current_job, engine_instance
+    global engine_instance
 
-    current_job.id = job_id
-    current_job.is_running = True
-    current_job.status = "processing"
-    current_job.progress = 0.0
+    current_job.update(id=job_id, is_running=True, status="processing", progress=0.0)
 
     try:
-        cfg = Config()
+        cfg = copy.copy(_DEFAULT_CFG)
         cfg.start_time = req.start_time
         cfg.end_time = req.end_time
         cfg.detection_threshold = req.detection_threshold
         if req.video_url:
             cfg.video_url = req.video_url
 
-        engine_instance = ScoutingEngine(cfg, use_sessions=True)
+        engine_instance = ScoutingEngine(
+            cfg, use_sessions=True, ocr_engine=get_ocr_engine()
+        )
 
         def progress_callback(prog: float, msg: str):
-            current_job.progress = prog
-            current_job.status = msg
+            current_job.update(progress=prog, status=msg)
 
         video_source = req.local_video_path if req.local_video_path else req.video_url
         engine_instance.process_video(
             video_source, progress_callback, session_id=req.session_id
         )
 
-        current_job.status = "completed"
-        current_job.progress = 1.0
+        current_job.update(status="completed", progress=1.0)
 
     except Exception as e:
         logger.error(f"Job failed: {e}")
-        current_job.status = f"error: {str(e)}"
+        current_job.update(status=f"error: {str(e)}")
     finally:
-        current_job.is_running = False
+        current_job.update(is_running=False)
 
 
+# Handlers that only touch in-memory state are async and run on the event
+# loop; the ones that list directories or read session files stay plain def
+# so FastAPI runs them in its threadpool instead of blocking the loop.
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Valorant Scouting Tool API is running"}
 
 
@@ -159,53 +254,96 @@ def get_session(session_id: str):
     )
 
 
+def _build_session_rounds(session_id: str, minimaps_dir: str, full_dir: str) -> dict:
+    rounds = []
+    if os.path.exists(minimaps_dir):
+        full_names = set(os.listdir(full_dir)) if os.path.isdir(full_dir) else set()
+        for round_num, basename in list_round_images(minimaps_dir):
+            full_name = f"round_{round_num:02d}_full.jpg"
+            if full_name not in full_names:
+                # Sessions saved before full screenshots were stored as JPEG
+                full_name = f"round_{round_num:02d}_full.png"
+            rounds.append(
+                {
+                    "round": round_num,
+                    "image_url": f"/sessions/{session_id}/minimaps/{basename}",
+                    "full_image_url": f"/sessions/{session_id}/full_screenshots/{full_name}",
+                }
+            )
+
+    return {
+        "session_id": session_id,
+        "rounds": rounds,
+    }
+
+
+def _dir_mtime_ns(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
 @app.get("/api/sessions/{session_id}/rounds")
-def get_session_rounds(session_id: str):
+def get_session_rounds(session_id: str, request: Request):
     """List all rounds for a specific session"""
     session_dir = session_manager.get_session_dir(session_id)
 
     if not os.path.exists(session_dir):
         raise HTTPException(status_code=404, detail="Session not found")
 
-    rounds = []
     minimaps_dir = os.path.join(session_dir, "minimaps")
-
-    if os.path.exists(minimaps_dir):
-        files = glob.glob(os.path.join(minimaps_dir, "round_*.png"))
-        for f in files:
-            basename = os.path.basename(f)
-            try:
-                round_num = int(basename.replace("round_", "").replace(".png", ""))
-                rounds.append(
-                    {
-                        "round": round_num,
-                        "image_url": f"/sessions/{session_id}/minimaps/{basename}",
-                        "full_image_url": f"/sessions/{session_id}/full_screenshots/round_{round_num:02d}_full.png",
-                    }
-                )
-            except:
-                continue
-
-    return {
-        "session_id": session_id,
-        "rounds": sorted(rounds, key=lambda x: x["round"]),
-    }
+    full_dir = os.path.join(session_dir, "full_screenshots")
+
+    # Adding or removing a round changes the directory mtimes, so the
+    # listing is rebuilt only when one of them moved
+    stamp = (_dir_mtime_ns(minimaps_dir), _dir_mtime_ns(full_dir))
+    cached = _session_rounds_cache.get(session_id)
+    if cached is None or cached[0] != stamp:
+        body = _dumps(_build_session_rounds(session_id, minimaps_dir, full_dir))
+        cached = (stamp, f'"{stamp[0]:x}-{stamp[1]:x}"', body)
+        # A directory changed within the last second may still get files with
+        # the same mtime (coarse filesystem clocks); do not trust it yet
+        if time.time_ns() - max(stamp) > ROUNDS_CACHE_SETTLE_NS:
+            _session_rounds_cache[session_id] = cached
+
+    _, etag, body = cached
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @app.get("/api/status", response_model=JobStatus)
-def get_status():
-    return JobStatus(
-        id=current_job.id,
-        is_running=current_job.is_running,
-        progress=current_job.progress,
-        status=current_job.status,
-        current_time=current_job.current_time,
-    )
+async def get_status():
+    # Polled continuously by the UI: the snapshot already has the JobStatus
+    # fields, so skip model validation and encode it directly
+    return Response(content=_dumps(current_job.snapshot()), media_type="application/json")
+
+
+@app.get("/api/status/stream")
+async def stream_status(request: Request):
+    """Server-Sent Events: the job status now, then again on every change"""
+    global _status_loop, _status_event
+    if _status_loop is None:
+        _status_event = asyncio.Event()
+        _status_loop = asyncio.get_running_loop()
+
+    async def events():
+        while not await request.is_disconnected():
+            # Take the event before the snapshot so no change is missed
+            event = _status_event
+            yield f"data: {_dumps(current_job.snapshot()).decode()}\n\n"
+            try:
+                await asyncio.wait_for(event.wait(), STATUS_STREAM_KEEPALIVE_SEC)
+            except asyncio.TimeoutError:
+                # Resend the state so idle connections stay open
+                pass
+
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 
 @app.post("/api/analyze")
-def start_analyze(req: AnalyzeRequest, background_tasks: BackgroundTasks):
-    global current_job
+async def start_analyze(req: AnalyzeRequest, background_tasks: BackgroundTasks):
     if current_job.is_running:
         raise HTTPException(status_code=400, detail="A job is already running")
 
@@ -215,17 +353,55 @@ def start_analyze(req: AnalyzeRequest, background_tasks: BackgroundTasks):
 
 
 @app.post("/api/stop")
-def stop_analyze():
-    global engine_instance, current_job
+async def stop_analyze():
     if current_job.is_running and engine_instance:
         engine_instance.stop_requested = True
         return {"message": "Stop requested"}
     return {"message": "No running job to stop"}
 
 
+def _rounds_stamp() -> tuple:
+    """
+    mtimes that change whenever /api/rounds would: the legacy output dir,
+    the sessions dir, and each session dir (session.json is replaced
+    atomically inside it) with its minimaps dir.
+    """
+    stamp = [_dir_mtime_ns(default_output), _dir_mtime_ns(sessions_dir)]
+    if os.path.isdir(sessions_dir):
+        with os.scandir(sessions_dir) as it:
+            for entry in it:
+                if entry.is_dir():
+                    stamp.append(
+                        (
+                            entry.name,
+                            entry.stat().st_mtime_ns,
+                            _dir_mtime_ns(os.path.join(entry.path, "minimaps")),
+                        )
+                    )
+    stamp[2:] = sorted(stamp[2:])
+    return tuple(stamp)
+
+
 @app.get("/api/rounds")
 def get_rounds():
     """List all detected rounds from all sessions, grouped by session"""
+    with _rounds_cache_lock:
+        stamp = _rounds_stamp()
+        if _rounds_cache["stamp"] == stamp:
+            return _rounds_cache["data"]
+
+        data = _build_rounds()
+        newest = max(
+            [stamp[0], stamp[1]] + [max(s[1], s[2]) for s in stamp[2:]]
+        )
+        # Same settling rule as the session rounds cache
+        if time.time_ns() - newest > ROUNDS_CACHE_SETTLE_NS:
+            _rounds_cache["stamp"] = stamp
+            _rounds_cache["data"] = data
+        return data
+
+
+def _build_rounds() -> dict:
     sessions_data = []
     
     # Get rounds from all sessions
@@ -238,20 +414,14 @@ def get_rounds():
             
             rounds = []
             if os.path.exists(minimaps_dir):
-                files = glob.glob(os.path.join(minimaps_dir, "round_*.png"))
-                for f in files:
-                    basename = os.path.basename(f)
-                    try:
-                        round_num = int(basename.replace("round_", "").replace(".png", ""))
-                        rounds.append(
-                            {
-                                "round": round_num,
-                                "image_url": f"/sessions/{session_id}/minimaps/{basename}",
-                                "timestamp": 0.0,
-                            }
-                        )
-                    except:
-                        continue
+                for round_num, basename in list_round_images(minimaps_dir):
+                    rounds.append(
+                        {
+                            "round": round_num,
+                            "image_url": f"/sessions/{session_id}/minimaps/{basename}",
+                            "timestamp": 0.0,
+                        }
+                    )
             
             if rounds:
                 sessions_data.append({
@@ -259,7 +429,7 @@ def get_rounds():
                     "created_at": session_info.get("created_at"),
                     "status": session_info.get("status"),
                     "round_count": len(rounds),
-                    "rounds": sorted(rounds, key=lambda x: x["round"])
+                    "rounds": rounds
                 })
         
         if sessions_data:
@@ -270,26 +440,15 @@ def get_rounds():
             }
     
     # Fallback to legacy output directory structure if no sessions exist
-    default_output = Config().output_dir
     rounds = []
-    files = glob.glob(os.path.join(default_output, "round_*.png"))
-    for f in files:
-        basename = os.path.basename(f)
-        if "_full" in basename or "_positions" in basename:
-            continue
-
-        try:
-            # simple parse round_09.png -> 9
-            round_num = int(basename.replace("round_", "").replace(".png", ""))
-            rounds.append(
-                {
-                    "round": round_num,
-                    "image_url": f"/static/{basename}",
-                    "timestamp": 0.0,
-                }
-            )
-        except:
-            continue
+    for round_num, basename in list_round_images(default_output):
+        rounds.append(
+            {
+                "round": round_num,
+                "image_url": f"/static/{basename}",
+                "timestamp": 0.0,
+            }
+        )
 
     return {
         "sessions": [{
@@ -297,7 +456,7 @@ def get_rounds():
             "created_at": None,
             "status": "legacy",
             "round_count": len(rounds),
-            "rounds": sorted(rounds, key=lambda x: x["round"])
+            "rounds": rounds
         }] if rounds else [],
         "total_sessions": 1 if rounds else 0,
         "rounds": len(rounds)
@@ -305,4 +464,7 @@ def get_rounds():
 
 
 if __name__ == "__main__":
+    # Single worker on purpose: the job state, the status stream and the shared
+    # OCR engine live in this process. uvicorn's default loop/http "auto"
+    # settings already pick uvloop and httptools when they are installed.
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,9 +1,8 @@
 import os
-import json
 import hashlib
 from datetime import datetime
-from typing import Dict, List, Optional
-from utils import setup_logger, ensure_dir
+from typing import Dict, List, Optional, Tuple
+from utils import setup_logger, ensure_dir, read_json, write_json
 
 logger = setup_logger("SessionManager")
 
@@ -33,6 +32,8 @@ class SessionManager:
         ensure_dir(self.sessions_dir)
         self.current_session_id: Optional[str] = None
         self.current_session_dir: Optional[str] = None
+        # path -> (file identity, parsed JSON); see _read_json_cached
+        self._json_cache: Dict[str, Tuple[Tuple[int, int, int], Dict]] = {}
 
     def create_session(
         self, video_url: str = None, video_id: str = None, tags: List[str] = None
@@ -52,11 +53,9 @@ class SessionManager:
         self.current_session_id = session_id
         self.current_session_dir = os.path.join(self.sessions_dir, session_id)
 
-        ensure_dir(self.current_session_dir)
-        ensure_dir(os.path.join(self.current_session_dir, "minimaps"))
-        ensure_dir(os.path.join(self.current_session_dir, "full_screenshots"))
-        ensure_dir(os.path.join(self.current_session_dir, "metadata"))
-        ensure_dir(os.path.join(self.current_session_dir, "analysis"))
+        # makedirs creates the session dir along with the first subdirectory
+        for subdir in ("minimaps", "full_screenshots", "metadata", "analysis"):
+            ensure_dir(os.path.join(self.current_session_dir, subdir))
 
         session_metadata = {
             "session_id": session_id,
@@ -106,8 +105,7 @@ class SessionManager:
             )
 
         session_file = os.path.join(self.get_session_dir(sid), "session.json")
-        with open(session_file, "w", encoding="utf-8") as f:
-            json.dump(metadata, f, indent=4, ensure_ascii=False)
+        write_json(session_file, metadata)
 
         logger.debug(f"Saved session metadata: {session_file}")
 
@@ -126,8 +124,7 @@ class SessionManager:
             )
 
         video_file = os.path.join(self.get_session_dir(sid), "video_info.json")
-        with open(video_file, "w", encoding="utf-8") as f:
-            json.dump(video_info, f, indent=4, ensure_ascii=False)
+        write_json(video_file, video_info)
 
         logger.debug(f"Saved video info: {video_file}")
 
@@ -147,24 +144,21 @@ class SessionManager:
             return
 
         session_file = os.path.join(self.get_session_dir(sid), "session.json")
-        if os.path.exists(session_file):
-            with open(session_file, "r", encoding="utf-8") as f:
-                metadata = json.load(f)
-
+        metadata = self._read_json_cached(session_file)
+        if metadata is not None:
             metadata["status"] = status
             if round_count is not None:
                 metadata["round_count"] = round_count
             metadata["updated_at"] = datetime.now().isoformat()
 
-            with open(session_file, "w", encoding="utf-8") as f:
-                json.dump(metadata, f, indent=4, ensure_ascii=False)
+            write_json(session_file, metadata)
 
             self._update_index(sid, metadata)
             logger.debug(f"Updated session status: {status}")
 
     def list_sessions(self) -> List[Dict]:
         """
-        List all sessions with metadata.
+        List all sessions with their summary metadata (the index.json fields).
 
         Returns:
             List of session metadata dictionaries
@@ -173,11 +167,23 @@ class SessionManager:
         if not os.path.exists(self.sessions_dir):
             return sessions
 
-        for session_id in os.listdir(self.sessions_dir):
-            session_file = os.path.join(self.sessions_dir, session_id, "session.json")
-            if os.path.exists(session_file):
-                with open(session_file, "r", encoding="utf-8") as f:
-                    sessions.append(json.load(f))
+        index_file = os.path.join(self.sessions_dir, "index.json")
+        index = self._read_json_cached(index_file) or {}
+
+        with os.scandir(self.sessions_dir) as it:
+            session_ids = [entry.name for entry in it if entry.is_dir()]
+
+        for session_id in session_ids:
+            # One index read covers every indexed session; session.json is
+            # only opened for directories the index does not know about
+            metadata = index.get(session_id)
+            if metadata is None:
+                session_file = os.path.join(
+                    self.sessions_dir, session_id, "session.json"
+                )
+                metadata = self._read_json_cached(session_file)
+            if metadata is not None:
+                sessions.append(dict(metadata))
 
         sessions.sort(key=lambda x: x.get("created_at", ""), reverse=True)
         return sessions
@@ -193,10 +199,29 @@ class SessionManager:
             Session metadata dictionary or None if not found
         """
         session_file = os.path.join(self.sessions_dir, session_id, "session.json")
-        if os.path.exists(session_file):
-            with open(session_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return None
+        return self._read_json_cached(session_file)
+
+    def _read_json_cached(self, path: str) -> Optional[Dict]:
+        """
+        Load a JSON object file, reusing the last parse while the file is
+        unchanged. Files are written via os.replace, so every write shows up
+        as a new inode even within one mtime tick.
+
+        Returns:
+            Shallow copy of the parsed dictionary, or None if not found
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._json_cache.pop(path, None)
+            return None
+
+        identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+        cached = self._json_cache.get(path)
+        if cached is None or cached[0] != identity:
+            cached = (identity, read_json(path))
+            self._json_cache[path] = cached
+        return dict(cached[1])
 
     def _update_index(self, session_id: str, metadata: Dict):
         """
@@ -208,10 +233,7 @@ class SessionManager:
         """
         index_file = os.path.join(self.sessions_dir, "index.json")
 
-        index = {}
-        if os.path.exists(index_file):
-            with open(index_file, "r", encoding="utf-8") as f:
-                index = json.load(f)
+        index = self._read_json_cached(index_file) or {}
 
         index[session_id] = {
             "session_id": metadata.get("session_id"),
@@ -222,5 +244,4 @@ class SessionManager:
             "tags": metadata.get("tags", []),
         }
 
-        with open(index_file, "w", encoding="utf-8") as f:
-            json.dump(index, f, indent=4, ensure_ascii=False)
+        write_json(index_file, index)
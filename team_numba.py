@@ -0,0 +1,94 @@
+import numpy as np
+
+try:
+    from numba import njit
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Team codes returned by classify_team_rings
+TEAM_ATTACK = 0
+TEAM_DEFEND = 1
+TEAM_UNKNOWN = 2
+TEAM_NAMES = ("attack", "defend", "unknown")
+
+# Rings with fewer in-image pixels than this are not classified
+MIN_RING_PIXELS = 10
+
+
+if NUMBA_AVAILABLE:
+
+    @njit(cache=True, fastmath=True)
+    def _classify_team_ring(img, cx, cy, r_in, r_out, offset):
+        h = img.shape[0]
+        w = img.shape[1]
+        r_in2 = r_in * r_in
+        r_out2 = r_out * r_out
+
+        sum_b = 0
+        sum_g = 0
+        sum_r = 0
+        count = 0
+
+        # Same (2r, 2r) window as the ring masks: rows cy - r .. cy + r - 1
+        for y in range(max(0, cy - r_out), min(h, cy + r_out)):
+            dy = y - cy
+            for x in range(max(0, cx - r_out), min(w, cx + r_out)):
+                dx = x - cx
+                d2 = dx * dx + dy * dy
+                if d2 >= r_in2 and d2 <= r_out2:
+                    sum_b += img[y, x, 0]
+                    sum_g += img[y, x, 1]
+                    sum_r += img[y, x, 2]
+                    count += 1
+
+        if count < MIN_RING_PIXELS:
+            return TEAM_UNKNOWN
+
+        b = sum_b / count
+        g = sum_g / count
+        r = sum_r / count
+
+        # Red = attack, Blue or Green = defend, otherwise dominant color
+        if r > g + offset and r > b + offset:
+            return TEAM_ATTACK
+        if b > r + offset or g > r + offset:
+            return TEAM_DEFEND
+        if r >= g and r >= b:
+            return TEAM_ATTACK
+        return TEAM_DEFEND
+
+    @njit(cache=True)
+    def _classify_team_rings(img, centers, sizes, ring_width, offset):
+        n = centers.shape[0]
+        teams = np.empty(n, dtype=np.int8)
+        for i in range(n):
+            r_in = sizes[i] // 2
+            teams[i] = _classify_team_ring(
+                img, centers[i, 0], centers[i, 1], r_in, r_in + ring_width, offset
+            )
+        return teams
+
+
+def classify_team_rings(
+    img: np.ndarray,
+    centers: np.ndarray,
+    sizes: np.ndarray,
+    ring_width: int,
+    offset: int,
+) -> np.ndarray:
+    """
+    Classify the team of each detection from the mean color of the ring
+    around it, without allocating per-detection temporaries.
+    img is uint8 BGR, centers is (N, 2) of (x, y), sizes is (N,) template sizes.
+    Returns int8 team codes (TEAM_ATTACK, TEAM_DEFEND, TEAM_UNKNOWN).
+    Requires numba; check NUMBA_AVAILABLE first.
+    """
+    return _classify_team_rings(
+        np.ascontiguousarray(img),
+        np.ascontiguousarray(centers, dtype=np.int64),
+        np.ascontiguousarray(sizes, dtype=np.int64),
+        int(ring_width),
+        int(offset),
+    )
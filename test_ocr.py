@@ -16,12 +16,13 @@ def test_ocr():
     
     ocr = PaddleOCREngine(device="gpu")
     
-    # Get frames from 5 minutes onwards
+    # Get frames from 5 minutes onwards: one seek to 300s, then each sample
+    # reads forward from there (extract_frames() would restart at frame 0)
     print("Skipping first 300 seconds...")
-    for _ in range(int(300 / (1.0 / fe.sample_rate))):
-        if not fe.cap.grab(): break
-    
-    for i, (idx, ts, frame) in enumerate(fe.extract_frames()):
+    for i in range(6):
+        result = fe.get_frame_at_time(300 + i / fe.sample_rate)
+        if result is None: break
+        idx, ts, frame = result
         print(f"Testing Frame at {ts:.2f}s...")
         detected, confidence = ocr.detect_timer(frame, cfg.timer_coords)
         if detected:
@@ -36,9 +37,6 @@ def test_ocr():
             x, y, w, h = cfg.timer_coords
             crop = frame[y:y+h, x:x+w]
             cv2.imwrite("test_timer_crop_failed.png", crop)
-        
-        if i >= 5: # Test first 5 frames
-            break
 
 if __name__ == "__main__":
     test_ocr()
@@ -1,18 +1,37 @@
+import json
 import logging
 import sys
 import os
-from typing import Optional
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Minimap crops are round_NN.png; _full/_positions images never match
+_ROUND_IMAGE_RE = re.compile(r"round_(\d+)\.png")
+
+
+_LOG_FORMATTER = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 def setup_logger(name: str = "ValorantTool", log_file: str = None) -> logging.Logger:
     logger = logging.getLogger(name)
+    # Already set up (same name requested again): adding handlers twice would print every line twice
+    if logger.handlers:
+        return logger
+
     logger.setLevel(logging.INFO)
-    
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # Our handlers print everything; don't emit again through handlers a library put on the root logger
+    logger.propagate = False
     
     # Console Handler
     ch = logging.StreamHandler(sys.stdout)
     ch.setLevel(logging.INFO)
-    ch.setFormatter(formatter)
+    ch.setFormatter(_LOG_FORMATTER)
     logger.addHandler(ch)
     
     # File Handler
@@ -20,14 +39,75 @@ def setup_logger(name: str = "ValorantTool", log_file: str = None) -> logging.Lo
         os.makedirs(os.path.dirname(log_file), exist_ok=True)
         fh = logging.FileHandler(log_file, encoding='utf-8')
         fh.setLevel(logging.DEBUG)
-        fh.setFormatter(formatter)
+        fh.setFormatter(_LOG_FORMATTER)
         logger.addHandler(fh)
         
     return logger
 
 def ensure_dir(path: str):
-    if not os.path.exists(path):
-        os.makedirs(path)
+    # exist_ok: no separate exists() check, and no race with another creator
+    os.makedirs(path, exist_ok=True)
+
+
+@contextmanager
+def atomic_open(path: str, mode: str = "w", encoding: Optional[str] = None):
+    """
+    Open a temporary file next to path for writing and move it over path
+    only once the block completes, so a crash never leaves a half-written file.
+    """
+    # Per-thread name, so concurrent writers of the same path do not clash
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode, encoding=encoding) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json(path: str, data: Any):
+    """
+    Write data as indented JSON, atomically; uses orjson when installed
+    (2-space indent, numpy values and non-string keys allowed).
+    """
+    if orjson is not None:
+        with atomic_open(path, "wb") as f:
+            f.write(
+                orjson.dumps(
+                    data,
+                    option=orjson.OPT_INDENT_2
+                    | orjson.OPT_NON_STR_KEYS
+                    | orjson.OPT_SERIALIZE_NUMPY,
+                )
+            )
+    else:
+        with atomic_open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+
+
+def read_json(path: str) -> Any:
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_round_images(directory: str) -> List[Tuple[int, str]]:
+    """
+    List the (round_num, filename) pairs of round_NN.png minimaps in a
+    directory, sorted by round. Only entry names are read, nothing is stat'ed.
+    """
+    rounds = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            match = _ROUND_IMAGE_RE.fullmatch(entry.name)
+            if match:
+                rounds.append((int(match.group(1)), entry.name))
+    rounds.sort()
+    return rounds
 
 
 def parse_timestamp(ts_str: Optional[str]) -> Optional[float]: